@@ -0,0 +1,129 @@
+#
+# Copyright IBM Corp. 2024
+# SPDX-License-Identifier: MIT
+#
+
+import sys
+import numpy as np
+import torch.distributed as dist
+import argparse
+from commbench import backend, buffers, params, results, sampling, timing
+
+# gradient allreduce for a whole model : one allreduce per parameter tensor, all tensors in
+# coalesced calls, and flat buckets of every size in --bucket-sizes (MB), as DDP and FSDP do ;
+# the tensors come from --shapes-file or from a transformer with --layers, --hidden, --vocab
+parser = argparse.ArgumentParser()
+parser.add_argument("-m", "--multiplier", type=int, default=1)
+parser.add_argument("--bucket-sizes", type=str, default="1,5,10,25,50,100,250")
+params.add_param_args(parser)
+backend.add_backend_args(parser)
+sampling.add_sampling_args(parser)
+buffers.add_buffer_args(parser)
+buffers.add_dtype_args(parser)
+results.add_results_args(parser)
+
+args = parser.parse_args()
+bucket_sizes = [float(s) for s in args.bucket_sizes.split(",") if s.strip()]
+
+comm = backend.init(args)
+
+rank = comm.rank
+world_size = comm.world_size
+device = comm.device
+
+# a step is finished when every tensor has been reduced, so time from the host
+timer = timing.Timer(comm, "host")
+sampler = sampling.Sampler(comm, args)
+dtypes = buffers.dtypes(args)
+
+if rank == 0:
+    print("backend : ", comm.name, " device : ", comm.device_type, " version : ", comm.version(), file=sys.stderr)
+
+counts = params.tensor_sizes(args)
+offsets = np.concatenate(([0], np.cumsum(counts)))
+nparams = int(offsets[-1])
+
+# coalesced calls go through the private _coalescing_manager, which the nccl backend supports
+coalesce = comm.name == "nccl" and hasattr(dist, "_coalescing_manager")
+
+# every tensor is a view of one flat buffer, laid out in model order, so that a bucket is a
+# contiguous range of it with no copies, as with gradient_as_bucket_view in DDP
+pool = buffers.BufferPool(comm, args.fill)
+for dtype_name, dtype, esize in dtypes:
+    pool.request("params", esize*nparams)
+pool.allocate()
+
+if rank == 0:
+    print(pool.report(), file=sys.stderr)
+    print("model : ", len(counts), " tensors, ", "{:.1f}".format(1.0e-6*nparams), " M parameters, largest tensor ",
+          "{:.1f}".format(1.0e-6*counts.max()), " M, median ", "{:.3f}".format(1.0e-6*np.median(counts)), " M", file=sys.stderr)
+    if not coalesce:
+        print("coalesced calls need the nccl backend and torch.distributed._coalescing_manager : skipped", file=sys.stderr)
+    print(" ", file=sys.stderr)
+
+writer = results.open_writer(args, comm, ntensors=len(counts), nparams=nparams)
+
+if rank == 0:
+    print(" method       bucket(MB)   calls   tavg(usec)    tmin(usec)    tmax(usec)  avgbw(GB/sec)  maxbw(GB/sec)  dtype", file=sys.stderr)
+
+for dtype_name, dtype, esize in dtypes:
+
+    flat = pool.view("params", nparams, dtype)
+    tensors = [flat[offsets[t]:offsets[t + 1]] for t in range(len(counts))]
+    nMB = 1.0e-6*esize*nparams
+
+    def per_tensor(async_op):
+        works = [dist.all_reduce(tensor, async_op=True) for tensor in reversed(tensors)]
+        for work in works:
+            work.wait()
+
+    def coalesced(async_op):
+        with dist._coalescing_manager(device=device, async_ops=True) as cm:
+            for tensor in reversed(tensors):
+                dist.all_reduce(tensor)
+        cm.wait()
+
+    cases = [("per_tensor", None, len(tensors), per_tensor)]
+    if coalesce:
+        cases.append(("coalesced", None, len(tensors), coalesced))
+
+    for bucket_MB in bucket_sizes:
+        ranges = params.buckets(counts, int(bucket_MB*1.0e6/esize))
+        views = [flat[start:stop] for start, stop in ranges]
+
+        def bucketed(async_op, views=views):
+            works = [dist.all_reduce(view, async_op=True) for view in views]
+            for work in works:
+                work.wait()
+
+        cases.append(("bucket", bucket_MB, len(views), bucketed))
+
+    nbytes = esize*2.0e-9*nparams*((world_size - 1)/world_size)
+
+    best = None
+    for method, bucket_MB, calls, fn in cases:
+
+        # two warmup calls are made outside the timing loop
+        times = sampler.run(timer, fn, nMB)["host"]
+        tavg, tmin, tmax = timing.summarize(times)
+
+        if method == "bucket" and (best is None or tavg < best[1]):
+            best = (bucket_MB, tavg)
+
+        if rank == 0:
+            label = "-" if bucket_MB is None else "{:.1f}".format(bucket_MB)
+            print(" ", "{:11s}".format(method), "{:>10s}".format(label), "{:7d}".format(calls), "  ", "{:9.1f}".format(tavg*1.0e6), "    ", "{:9.1f}".format(tmin*1.0e6),
+                  "    ", "{:9.1f}".format(tmax*1.0e6), "     ", "{:7.2f}".format(nbytes/tavg), "      ", "{:7.2f}".format(nbytes/tmin), "  ", "{:>5s}".format(dtype_name), file=sys.stderr)
+
+        record = {"collective": "allreduce", "size_MB": nMB, "bytes": esize*nparams, "group": "world", "group_size": world_size, "timer": "host",
+                  "dtype": dtype_name, "method": method, "bucket_MB": bucket_MB, "calls": calls}
+        record.update(results.timing_record(times, nbytes))
+        writer.write(record)
+
+    if rank == 0 and best is not None:
+        print("best bucket size for ", dtype_name, " : ", best[0], " MB at ", "{:.2f}".format(nbytes/best[1]), " GB/sec", file=sys.stderr)
+        print(" ", file=sys.stderr)
+
+writer.close()
+
+comm.destroy()
@@ -3,99 +3,213 @@
 # SPDX-License-Identifier: MIT
 #
 
-import os
 import sys
 import torch
 import torch.distributed as dist
 import time
 import numpy as np
+import json
+import socket
 import argparse
+from commbench import analysis, backend, clocksync, timesfile
 
-# optional args : -i iterations   and  -s array size (in MBytes)
+# optional args : -i iterations, -s array size (in MBytes), and -o output file for the per-iteration times ;
+# -d duration (in seconds) runs for a wall-clock time instead, flushing chunks of -k iterations to disk
 parser = argparse.ArgumentParser()
 parser.add_argument("-i", "--iterations", type=int, default=5000)
 parser.add_argument("-s", "--size", type=int, default=500)
+parser.add_argument("-o", "--output", type=str, default=None)
+parser.add_argument("--times-format", choices=["npy", "raw", "txt"], default=None)
+parser.add_argument("-d", "--duration", type=float, default=None)
+parser.add_argument("-k", "--chunk", type=int, default=10000)
+parser.add_argument("--timeline", type=str, default=None)
+parser.add_argument("--pings", type=int, default=10)
+backend.add_backend_args(parser)
 
 args = parser.parse_args()
+if args.duration is not None and args.timeline is not None:
+    sys.exit("--timeline needs a fixed iteration count : it cannot be combined with --duration")
 maxiter = args.iterations
 nMB = args.size
+duration = args.duration
+chunk = args.chunk
 
-local_rank = int(os.environ["LOCAL_RANK"])
-rank = int(os.environ["RANK"])
-world_size = int(os.environ["WORLD_SIZE"])
+# chunks are appended to a raw file, since the final number of iterations is not known in advance
+if args.output is None:
+    args.output = "times.npy" if duration is None else "times.bin"
 
-torch.cuda.set_device(local_rank)
+comm = backend.init(args)
 
-dist.init_process_group("nccl")
+rank = comm.rank
+world_size = comm.world_size
+device = comm.device
 
 if rank == 0:
-    print("world size = ", world_size, " NCCL version = ", torch.cuda.nccl.version(), file=sys.stderr)
+    print("world size = ", world_size, " backend = ", comm.name, " device = ", comm.device_type, " version = ", comm.version(), file=sys.stderr)
 
 torch.manual_seed(1235911);
 
 npts = int(nMB*1.0e6/4.0)
 
-Tensor = torch.rand(npts, device='cuda')
-torch.cuda.synchronize()
+Tensor = torch.rand(npts, device=device)
+comm.synchronize()
 
 if rank == 0:
     print("size(MB)   avgbw(GB/sec)   maxbw(GB/sec)     minbw(GB/sec)", file=sys.stderr)
 
-mytimes = np.empty(maxiter, dtype=float)
-
 npts = int(nMB*1.0e6/4.0)
 nm1 = int(npts - 1)
 
 # launch two calls outside the timing loop
 dist.all_reduce(Tensor[0:nm1], op=dist.ReduceOp.SUM)
-torch.cuda.synchronize()
+comm.synchronize()
 dist.all_reduce(Tensor[0:nm1], op=dist.ReduceOp.SUM)
-torch.cuda.synchronize()
-
-tbeg = time.perf_counter()
-t1 = tbeg
-tmin = 1.0e30
-tmax = 0.0
-
-for i in range(maxiter):
-    dist.all_reduce(Tensor[0:nm1], op=dist.ReduceOp.SUM)
-    torch.cuda.synchronize()
-    t2 = time.perf_counter()
-    if (t2 - t1) < tmin:
-        tmin = (t2 - t1)
-    if (t2 - t1) > tmax:
-        tmax = (t2 - t1)
-    mytimes[i] = t2 - t1
-    t1 = t2
-
-torch.cuda.synchronize()
-tend = time.perf_counter()
-
-elapsed = tend - tbeg
-
-avg_bandwidth = 4.0*2.0e-9*maxiter*npts*((world_size - 1)/world_size)/elapsed
-max_bandwidth = 4.0*2.0e-9*npts*((world_size - 1)/world_size)/tmin
-min_bandwidth = 4.0*2.0e-9*npts*((world_size - 1)/world_size)/tmax
-
-nglobal = maxiter*world_size
-
-gputimes = torch.from_numpy(mytimes).float().cuda()
-alltimes = torch.rand(nglobal, dtype=torch.float, device='cuda')
-torch.cuda.synchronize()
-
-dist.all_gather_into_tensor(alltimes, gputimes)
-torch.cuda.synchronize()
-
-alltimes = alltimes.cpu()
-torch.cuda.synchronize()
-
-if rank == 0:
-    print("{:7.1f}".format(nMB), "    ", "{:6.1f}".format(avg_bandwidth), "       ", "{:6.1f}".format(max_bandwidth), "        ", "{:6.1f}".format(min_bandwidth), file=sys.stderr)
-
-
-if rank == 0:
-    outfile = open("times.txt", "w")
-    for i in range(nglobal):
-        print(alltimes[i].numpy(), file=outfile)
-
-dist.destroy_process_group()
+comm.synchronize()
+
+if duration is None and args.timeline is not None:
+    sync_group = clocksync.host_group(comm)
+    clock_before = clocksync.estimate_offsets(comm, sync_group, args.pings)
+
+if duration is not None:
+    # long-run mode : each rank records a chunk of -k iterations, and at the end of the chunk the
+    # chunks are gathered to rank 0, which appends them to the output file from a background thread.
+    # The gather runs outside the timed region, with every rank's clock restarted after it, so no
+    # sample includes it.  Every rank sends its elapsed time along with its chunk, so all ranks see
+    # the same gathered values and agree on when to stop, and on a shorter last chunk that ends
+    # the run close to the requested duration.
+    mine = np.empty(chunk, dtype=np.float64)
+    Send = torch.zeros(chunk + 1, dtype=torch.float64, device=device)
+    Gathered = torch.empty(world_size*(chunk + 1), dtype=torch.float64, device=device)
+
+    # the statistics and the progress line for each chunk come from the appender thread on rank 0,
+    # so that no other rank waits for them in its next allreduce
+    def progress(block, elapsed):
+        print("elapsed ", "{:8.1f}".format(elapsed), " sec : avg = ", "{:.3f}".format(1.0e3*block.mean()),
+              " p99 = ", "{:.3f}".format(1.0e3*np.percentile(block, 99.0)), " max = ", "{:.3f}".format(1.0e3*block.max()),
+              " msec", file=sys.stderr)
+
+    if rank == 0:
+        appender = timesfile.Appender(args.output, world_size, report=progress)
+
+    tbeg = time.perf_counter()
+    tmin = 1.0e30
+    tmax = 0.0
+    tsum = 0.0
+    niter = 0
+    ncur = chunk
+
+    while True:
+        t1 = time.perf_counter()
+        for i in range(ncur):
+            dist.all_reduce(Tensor[0:nm1], op=dist.ReduceOp.SUM)
+            comm.synchronize()
+            t2 = time.perf_counter()
+            if (t2 - t1) < tmin:
+                tmin = (t2 - t1)
+            if (t2 - t1) > tmax:
+                tmax = (t2 - t1)
+            tsum = tsum + (t2 - t1)
+            mine[i] = t2 - t1
+            t1 = t2
+        niter = niter + ncur
+
+        Send[0:ncur].copy_(torch.from_numpy(mine[0:ncur]))
+        Send[chunk] = t2 - tbeg
+        dist.all_gather_into_tensor(Gathered, Send)
+        # a copy, since on the CPU the numpy array would share memory with the gather buffer
+        block = np.array(Gathered.cpu().numpy().reshape(world_size, chunk + 1), copy=True)
+        elapsed = block[:, chunk].max()
+        if rank == 0:
+            appender.append(block[:, 0:ncur], elapsed)
+        if elapsed >= duration:
+            break
+        ncur = max(1, min(chunk, int(np.ceil((duration - elapsed)*niter/elapsed))))
+
+    avg_bandwidth = 4.0*2.0e-9*npts*((world_size - 1)/world_size)/(tsum/niter)
+    max_bandwidth = 4.0*2.0e-9*npts*((world_size - 1)/world_size)/tmin
+    min_bandwidth = 4.0*2.0e-9*npts*((world_size - 1)/world_size)/tmax
+
+    if rank == 0:
+        appender.close()
+        print("{:7.1f}".format(nMB), "    ", "{:6.1f}".format(avg_bandwidth), "       ", "{:6.1f}".format(max_bandwidth), "        ", "{:6.1f}".format(min_bandwidth), file=sys.stderr)
+        print("wrote ", world_size, " x ", niter, " times to ", args.output, file=sys.stderr)
+
+else:
+    mytimes = np.empty(maxiter, dtype=float)
+    # absolute entry and exit times for each call, for the straggler timeline
+    mystamps = np.empty((maxiter, 2), dtype=float)
+
+    tbeg = time.perf_counter()
+    t1 = tbeg
+    tmin = 1.0e30
+    tmax = 0.0
+
+    for i in range(maxiter):
+        mystamps[i, 0] = time.perf_counter()
+        dist.all_reduce(Tensor[0:nm1], op=dist.ReduceOp.SUM)
+        comm.synchronize()
+        t2 = time.perf_counter()
+        mystamps[i, 1] = t2
+        if (t2 - t1) < tmin:
+            tmin = (t2 - t1)
+        if (t2 - t1) > tmax:
+            tmax = (t2 - t1)
+        mytimes[i] = t2 - t1
+        t1 = t2
+
+    comm.synchronize()
+    tend = time.perf_counter()
+
+    elapsed = tend - tbeg
+
+    avg_bandwidth = 4.0*2.0e-9*maxiter*npts*((world_size - 1)/world_size)/elapsed
+    max_bandwidth = 4.0*2.0e-9*npts*((world_size - 1)/world_size)/tmin
+    min_bandwidth = 4.0*2.0e-9*npts*((world_size - 1)/world_size)/tmax
+
+    nglobal = maxiter*world_size
+
+    # keep the full float64 precision of perf_counter differences
+    gputimes = torch.from_numpy(mytimes).to(device)
+    alltimes = torch.empty(nglobal, dtype=torch.float64, device=device)
+    comm.synchronize()
+
+    dist.all_gather_into_tensor(alltimes, gputimes)
+    comm.synchronize()
+
+    alltimes = alltimes.cpu().numpy().reshape(world_size, maxiter)
+
+    if rank == 0:
+        print("{:7.1f}".format(nMB), "    ", "{:6.1f}".format(avg_bandwidth), "       ", "{:6.1f}".format(max_bandwidth), "        ", "{:6.1f}".format(min_bandwidth), file=sys.stderr)
+
+
+    # one bulk write of the (ranks, iterations) array
+    if rank == 0:
+        t1 = time.perf_counter()
+        timesfile.save(args.output, alltimes, args.times_format)
+        t2 = time.perf_counter()
+        print("wrote ", world_size, " x ", maxiter, " times to ", args.output, " in ", "{:.3f}".format(t2 - t1), " sec", file=sys.stderr)
+
+    # map every rank's entry and exit times onto rank 0's clock, using offsets measured before and after
+    if args.timeline is not None:
+        clock_after = clocksync.estimate_offsets(comm, sync_group, args.pings)
+
+        hostnames = [None]*world_size
+        dist.all_gather_object(hostnames, socket.gethostname())
+
+        localstamps = torch.from_numpy(mystamps.reshape(-1)).to(device)
+        allstamps = torch.empty(nglobal*2, dtype=torch.float64, device=device)
+        dist.all_gather_into_tensor(allstamps, localstamps)
+        comm.synchronize()
+
+        if rank == 0:
+            timeline = clocksync.align(allstamps.cpu().numpy().reshape(world_size, maxiter, 2), clock_before, clock_after)
+            timesfile.save(args.timeline, timeline)
+            with open(args.timeline + ".hosts.json", "w") as f:
+                json.dump(hostnames, f)
+
+            drift = np.abs(clock_after[0] - clock_before[0]).max()
+            print("clock offsets : max ", "{:.3f}".format(1.0e3*np.abs(clock_before[0]).max()), " msec, max drift during the run ",
+                  "{:.3f}".format(1.0e3*drift), " msec", file=sys.stderr)
+            analysis.print_straggler_report(*analysis.straggler_report(timeline[:, :, 0], timeline[:, :, 1], hostnames), file=sys.stderr)
+
+comm.destroy()
@@ -0,0 +1,120 @@
+#
+# Copyright IBM Corp. 2024
+# SPDX-License-Identifier: MIT
+#
+
+import sys
+import itertools
+import torch
+import torch.distributed as dist
+import argparse
+from commbench import backend, buffers, results, sampling, sizes, splits, timing
+
+# the size is the number of bytes that each rank sends ; with --splits zipf the destinations
+# are skewed as in mixture-of-experts token routing, and with both the cost of the imbalance is
+# the time for the skewed splits relative to the uniform splits
+parser = argparse.ArgumentParser()
+parser.add_argument("-m", "--multiplier", type=int, default=1)
+backend.add_backend_args(parser)
+timing.add_timing_args(parser)
+sampling.add_sampling_args(parser)
+sizes.add_size_args(parser)
+buffers.add_buffer_args(parser)
+buffers.add_dtype_args(parser)
+splits.add_split_args(parser)
+results.add_results_args(parser)
+
+args = parser.parse_args()
+
+comm = backend.init(args)
+
+rank = comm.rank
+world_size = comm.world_size
+device = comm.device
+
+timer = timing.Timer(comm, args.timer)
+sampler = sampling.Sampler(comm, args)
+sweep = sizes.sweep(args)
+dtypes = buffers.dtypes(args)
+distributions = splits.distributions(args)
+
+if rank == 0:
+    print("backend : ", comm.name, " device : ", comm.device_type, " version : ", comm.version(), file=sys.stderr)
+
+torch.manual_seed(1235911);
+
+# the split matrix for every size, dtype, and distribution, and a pool sized for the busiest receiver
+matrices = {}
+pool = buffers.BufferPool(comm, args.fill)
+for nMB in sweep:
+    for (dtype_name, dtype, esize), distribution in itertools.product(dtypes, distributions):
+        matrix = splits.split_matrix(world_size, int(nMB*1.0e6/esize), distribution, args.zipf_alpha, args.seed)
+        matrices[(nMB, dtype_name, distribution)] = matrix
+        pool.request("input", esize*int(matrix[rank].sum()))
+        pool.request("output", esize*int(matrix[:, rank].sum()))
+pool.allocate()
+
+if rank == 0:
+    print(pool.report(), file=sys.stderr)
+
+writer = results.open_writer(args, comm, zipf_alpha=args.zipf_alpha, seed=args.seed)
+
+if rank == 0:
+    print(" size(MB)   tavg(usec)    tmin(usec)    tmax(usec)  avgbw(GB/sec)  maxbw(GB/sec)  minbw(GB/sec)   timer  dtype    splits  imbalance     cost", file=sys.stderr)
+
+for nMB in sweep:
+
+    for dtype_name, dtype, esize in dtypes:
+
+        uniform_time = {}
+
+        for distribution in distributions:
+
+            matrix = matrices[(nMB, dtype_name, distribution)]
+            input_splits = matrix[rank].tolist()
+            output_splits = matrix[:, rank].tolist()
+
+            Input  = pool.view("input",  sum(input_splits),  dtype)
+            Output = pool.view("output", sum(output_splits), dtype)
+
+            # the splits are given explicitly for the uniform case too, so that both take the same code path
+            def collective(async_op):
+                return dist.all_to_all_single(Output, Input, output_splits, input_splits, async_op=async_op)
+
+            # two warmup calls are made outside the timing loop
+            times = sampler.run(timer, collective, nMB)
+
+            # with uneven splits the ranks finish at different times, so take the slowest rank
+            for name in times:
+                times[name] = timing.slowest(times[name], comm)
+
+            nsend = int(matrix[rank].sum())
+            nbytes = esize*1.0e-9*nsend*((world_size - 1)/world_size)
+            skew = splits.imbalance(matrix)
+
+            for name in times:
+                tavg, tmin, tmax = timing.summarize(times[name])
+
+                avgbw = nbytes/tavg
+                maxbw = nbytes/tmin
+                minbw = nbytes/tmax
+
+                if distribution == "uniform":
+                    uniform_time[name] = tavg
+                cost = tavg/uniform_time[name] if name in uniform_time else float("nan")
+
+                if rank == 0:
+                    print("{:8.2f}".format(nMB), "  ", "{:7.1f}".format(tavg*1.0e6), "      ", "{:7.1f}".format(tmin*1.0e6), "      ", "{:7.1f}".format(tmax*1.0e6), \
+                          "     ", "{:7.2f}".format(avgbw), "      ", "{:7.2f}".format(maxbw), "      ", "{:7.2f}".format(minbw), "  ", "{:>6s}".format(name), \
+                          "{:>6s}".format(dtype_name), "{:>9s}".format(distribution), "{:10.3f}".format(skew), "{:8.3f}".format(cost), file=sys.stderr)
+
+                record = {"collective": "alltoall", "size_MB": nMB, "bytes": esize*nsend, "group": "world", "group_size": world_size, "timer": name,
+                          "dtype": dtype_name, "splits": distribution, "imbalance": skew}
+                if name in uniform_time:
+                    record["imbalance_cost"] = cost
+                record.update(results.timing_record(times[name], nbytes))
+                writer.write(record)
+
+writer.close()
+
+comm.destroy()
@@ -0,0 +1,102 @@
+#
+# Copyright IBM Corp. 2024
+# SPDX-License-Identifier: MIT
+#
+
+import os
+import sys
+import json
+import time
+import argparse
+from commbench import analysis, timesfile
+
+# usage : python analyze.py times.npy   (also reads raw files, or times.txt with --ranks)
+parser = argparse.ArgumentParser()
+parser.add_argument("path")
+parser.add_argument("-r", "--ranks", type=int, default=None)
+parser.add_argument("-b", "--bins-per-decade", type=int, default=10)
+parser.add_argument("-t", "--threshold", type=float, default=2.0)
+parser.add_argument("-n", "--top", type=int, default=20)
+parser.add_argument("--timeline", type=str, default=None)
+
+args = parser.parse_args()
+
+t1 = time.perf_counter()
+
+times = timesfile.load(args.path, args.ranks)
+if times.ndim != 2:
+    sys.exit(args.path + " does not hold a (ranks, iterations) array")
+nranks, niter = times.shape
+
+stats = analysis.summary(times)
+
+print("got npts = ", stats["npts"], " for ", nranks, " ranks x ", niter, " iterations")
+print("avg = ", "{:.3f}".format(1.0e3*stats["avg"]), " median = ", "{:.3f}".format(1.0e3*stats["percentiles"][50.0]),
+      " tmin = ", "{:.3f}".format(1.0e3*stats["min"]), " tmax = ", "{:.3f}".format(1.0e3*stats["max"]), " msec")
+print("p50 = ", "{:.3f}".format(1.0e3*stats["percentiles"][50.0]), " p90 = ", "{:.3f}".format(1.0e3*stats["percentiles"][90.0]),
+      " p99 = ", "{:.3f}".format(1.0e3*stats["percentiles"][99.0]), " p99.9 = ", "{:.3f}".format(1.0e3*stats["percentiles"][99.9]), " msec")
+print("")
+
+lower, upper, counts = analysis.log_histogram(times, args.bins_per_decade)
+
+print("histogram of times in msec for all ranks")
+print(" [     min -        max ):      count")
+for k in range(len(counts)):
+    print("{:10.3f}".format(1.0e3*lower[k]), "-", "{:10.3f}".format(1.0e3*upper[k]), " : ", "{:10d}".format(int(counts[k])))
+print("")
+
+ranks = analysis.per_rank(times)
+slowest = ranks["p99"].argsort()[::-1][:args.top]
+
+print("per-rank times in msec, sorted by p99")
+print("   rank        mean         p50         p99         max")
+for r in slowest:
+    print("{:7d}".format(r), "{:11.3f}".format(1.0e3*ranks["mean"][r]), "{:11.3f}".format(1.0e3*ranks["p50"][r]),
+          "{:11.3f}".format(1.0e3*ranks["p99"][r]), "{:11.3f}".format(1.0e3*ranks["max"][r]))
+print("")
+
+iters = analysis.per_iteration(times)
+worst = iters["max"].argsort()[::-1][:args.top]
+
+print("per-iteration times in msec, sorted by the slowest rank")
+print("   iteration      median         max   slowest rank")
+for i in worst:
+    print("{:12d}".format(i), "{:11.3f}".format(1.0e3*iters["median"][i]), "{:11.3f}".format(1.0e3*iters["max"][i]),
+          "{:14d}".format(iters["argmax"][i]))
+print("")
+
+cutoff, slow = analysis.outliers(times, args.threshold, args.top)
+
+print("outliers above ", "{:.3f}".format(1.0e3*cutoff), " msec (", args.threshold, " x median) : rank, iteration, msec")
+for r, i, t in slow:
+    print("{:7d}".format(r), "{:12d}".format(i), "{:11.3f}".format(1.0e3*t))
+print("")
+
+events = analysis.classify_slow_iterations(times, args.threshold)
+
+print("slow iterations : ", len(events["slow_iterations"]))
+print("  network-wide (most ranks slow together) : ", len(events["wide"]))
+print("  partial (a subset of ranks slow)        : ", len(events["partial"]))
+print("  local straggler (one rank slow)         : ", len(events["single"]))
+if len(events["stragglers"]) > 0:
+    print("  ranks that were slow on their own : rank (count)")
+    for r, n in events["stragglers"][:args.top]:
+        print("   ", r, "(" + str(n) + ")")
+print("")
+
+# straggler timeline from allreduce-stats.py --timeline, with entry and exit times on a common clock
+if args.timeline is not None:
+    timeline = timesfile.load(args.timeline)
+    # a text timeline is flat, with (entry, exit) pairs in rank-major order like the times file
+    if timeline.ndim != 3:
+        if timeline.size != nranks*niter*2:
+            sys.exit(args.timeline + " does not hold a (ranks, iterations, 2) timeline for " + str(nranks) + " ranks x " + str(niter) + " iterations")
+        timeline = timeline.reshape(nranks, niter, 2)
+    hosts = None
+    if os.path.exists(args.timeline + ".hosts.json"):
+        with open(args.timeline + ".hosts.json") as f:
+            hosts = json.load(f)
+    report = analysis.straggler_report(timeline[:, :, 0], timeline[:, :, 1], hosts, args.threshold, args.top)
+    analysis.print_straggler_report(*report, top=args.top)
+
+print("analysis time = ", "{:.3f}".format(time.perf_counter() - t1), " sec", file=sys.stderr)
@@ -0,0 +1,6 @@
+#
+# Copyright IBM Corp. 2024
+# SPDX-License-Identifier: MIT
+#
+
+# shared helpers for the benchmark scripts in the top-level directory
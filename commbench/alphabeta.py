@@ -0,0 +1,148 @@
+#
+# Copyright IBM Corp. 2024
+# SPDX-License-Identifier: MIT
+#
+
+import csv
+import itertools
+import json
+import math
+import sys
+import numpy as np
+
+# ring-algorithm scaling with the group size p : the number of latency steps and the fraction of
+# the message that each rank sends, so that t = alpha*steps(p) + beta*volume(p)*n for n bytes
+STEPS = {"allreduce": lambda p: 2.0*(p - 1), "allgather": lambda p: 1.0*(p - 1), "reduce_scatter": lambda p: 1.0*(p - 1),
+         "alltoall": lambda p: 1.0*(p - 1)}
+VOLUME = {"allreduce": lambda p: 2.0*(p - 1)/p, "allgather": lambda p: (p - 1)/p, "reduce_scatter": lambda p: (p - 1)/p,
+          "alltoall": lambda p: (p - 1)/p}
+
+
+# records written with --results, as a list of dicts ; csv values are converted to numbers
+def load_records(path):
+    if path.endswith(".jsonl"):
+        with open(path) as f:
+            return [json.loads(line) for line in f if line.strip()]
+    if path.endswith(".parquet"):
+        try:
+            import pyarrow.parquet
+        except ImportError:
+            sys.exit("reading parquet results requires pyarrow")
+        return pyarrow.parquet.read_table(path).to_pylist()
+    records = []
+    with open(path) as f:
+        for row in csv.DictReader(f):
+            record = {}
+            for key, value in row.items():
+                if value == "":
+                    continue
+                try:
+                    record[key] = float(value)
+                except ValueError:
+                    record[key] = value
+            records.append(record)
+    return records
+
+
+# the design matrix for one segment : an optional constant, the latency term, the bandwidth term,
+# and with congestion a bandwidth term that grows with log2(p)
+def features(collective, n, p, intercept=False, congestion=False):
+    steps = STEPS.get(collective, STEPS["allgather"])
+    volume = VOLUME.get(collective, VOLUME["allgather"])
+    columns = [np.array([steps(q) for q in p]), np.array([volume(q) for q in p])*n]
+    if congestion:
+        columns.append(columns[1]*np.log2(np.maximum(p, 2.0)))
+    if intercept:
+        columns.insert(0, np.ones(len(n)))
+    return np.column_stack(columns)
+
+
+# least squares in relative error, since the times span several decades ; returns the
+# coefficients and the sum of squared relative errors
+def fit_segment(X, t):
+    w = 1.0/t
+    coef, *rest = np.linalg.lstsq(X*w[:, None], np.ones(len(t)), rcond=None)
+    rel = (X @ coef - t)/t
+    return coef, float(rel @ rel)
+
+
+# a piecewise model over the message size : every choice of up to max_breaks breakpoints between
+# distinct sizes is fitted, with at least min_points sizes and three times as many points as
+# coefficients in every segment.  Each added breakpoint must lower the BIC and cut the squared
+# error by at least min_gain, so a breakpoint is only accepted where the protocol or algorithm
+# change is clearly visible in the data.  The congestion term needs at least three group sizes,
+# since with fewer it cannot be told apart from the bandwidth term
+def fit(collective, n, p, t, max_breaks=2, congestion=False, min_points=3, min_gain=0.5):
+    n = np.asarray(n, dtype=np.float64)
+    p = np.asarray(p, dtype=np.float64)
+    t = np.asarray(t, dtype=np.float64)
+    ngroups = len(np.unique(p))
+    intercept = ngroups > 1
+    congestion = congestion and ngroups >= 3
+    ncoef = 2 + int(intercept) + int(congestion)
+    sizes = np.unique(n)
+    npts = len(t)
+
+    # the best split for every number of breakpoints
+    best = []
+    for nbreaks in range(0, max_breaks + 1):
+        best.append(None)
+        for cuts in itertools.combinations(range(1, len(sizes)), nbreaks):
+            edges = [-math.inf] + [0.5*(sizes[c - 1] + sizes[c]) for c in cuts] + [math.inf]
+            coefs = []
+            rss = 0.0
+            ok = True
+            for k in range(len(edges) - 1):
+                mask = (n > edges[k]) & (n <= edges[k + 1])
+                if len(np.unique(n[mask])) < min_points or mask.sum() < 3*ncoef:
+                    ok = False
+                    break
+                coef, r = fit_segment(features(collective, n[mask], p[mask], intercept, congestion), t[mask])
+                coefs.append(coef)
+                rss += r
+            if not ok:
+                continue
+            if best[nbreaks] is None or rss < best[nbreaks]["rss"]:
+                best[nbreaks] = {"breaks": [float(b) for b in edges[1:-1]], "coefs": [c.tolist() for c in coefs], "rss": rss}
+
+    chosen = None
+    for nbreaks, model in enumerate(best):
+        if model is None:
+            continue
+        nparams = ncoef*(nbreaks + 1) + nbreaks
+        model["bic"] = npts*math.log(max(model["rss"], 1.0e-30)/npts) + nparams*math.log(npts)
+        if chosen is None:
+            chosen = model
+        elif model["bic"] < chosen["bic"] and model["rss"] <= (1.0 - min_gain)*chosen["rss"]:
+            chosen = model
+    if chosen is None:
+        return None
+    rss = chosen.pop("rss")
+    chosen.update({"collective": collective, "intercept": intercept, "congestion": congestion, "rms": math.sqrt(rss/npts)})
+    return chosen
+
+
+# predicted time in seconds for messages of n bytes on groups of p ranks
+def predict(model, n, p):
+    n = np.atleast_1d(np.asarray(n, dtype=np.float64))
+    p = np.broadcast_to(np.asarray(p, dtype=np.float64), n.shape)
+    segment = np.searchsorted(np.asarray(model["breaks"]), n, side="left")
+    t = np.empty(len(n))
+    for k, coef in enumerate(model["coefs"]):
+        mask = segment == k
+        if mask.any():
+            t[mask] = features(model["collective"], n[mask], p[mask], model["intercept"], model["congestion"]) @ np.asarray(coef)
+    return t
+
+
+# the latency per step in seconds and the bandwidth in bytes/sec for every segment
+def describe(model):
+    rows = []
+    offset = 1 if model["intercept"] else 0
+    bounds = [0.0] + list(model["breaks"]) + [math.inf]
+    for k, coef in enumerate(model["coefs"]):
+        alpha = coef[offset]
+        beta = coef[offset + 1]
+        rows.append({"from": bounds[k], "to": bounds[k + 1], "constant": coef[0] if model["intercept"] else 0.0, "alpha": alpha,
+                     "bandwidth": 1.0/beta if beta > 0.0 else math.inf, "congestion": coef[offset + 2] if model["congestion"] else 0.0})
+    return rows
@@ -0,0 +1,117 @@
+#
+# Copyright IBM Corp. 2024
+# SPDX-License-Identifier: MIT
+#
+
+import numpy as np
+
+PERCENTILES = [50.0, 90.0, 99.0, 99.9]
+
+
+# times is a (ranks, iterations) array in seconds, possibly memory-mapped
+def summary(times):
+    flat = np.asarray(times).reshape(-1)
+    pct = np.percentile(flat, PERCENTILES)
+    return {"npts": flat.size, "avg": float(flat.mean()), "min": float(flat.min()), "max": float(flat.max()),
+            "percentiles": dict(zip(PERCENTILES, pct.tolist()))}
+
+
+# log-scale histogram with bins_per_decade bins per factor of ten, using the same bin
+# boundaries as analyze.c ; returns the lower and upper edges of each bin and the counts
+def log_histogram(times, bins_per_decade=10):
+    flat = np.asarray(times).reshape(-1)
+    flat = flat[flat > 0.0]
+    if flat.size == 0:
+        return np.empty(0), np.empty(0), np.empty(0, dtype=np.int64)
+    scaled = bins_per_decade*np.log10(flat)
+    kmin = int(np.floor(scaled.min()))
+    kmax = int(np.ceil(scaled.max()))
+    nbins = max(1, kmax - kmin)
+    bins = np.minimum(np.floor(scaled).astype(np.int64) - kmin, nbins - 1)
+    counts = np.bincount(bins, minlength=nbins)
+    lower = 10.0**((kmin + np.arange(nbins))/bins_per_decade)
+    upper = 10.0**((kmin + np.arange(1, nbins + 1))/bins_per_decade)
+    return lower, upper, counts
+
+
+# mean, median, p99, and max for every rank
+def per_rank(times):
+    times = np.asarray(times)
+    p50, p99 = np.percentile(times, [50.0, 99.0], axis=1)
+    return {"mean": times.mean(axis=1), "p50": p50, "p99": p99, "max": times.max(axis=1)}
+
+
+# median, max, and the slowest rank for every iteration
+def per_iteration(times):
+    times = np.asarray(times)
+    return {"median": np.median(times, axis=0), "max": times.max(axis=0), "argmax": times.argmax(axis=0)}
+
+
+# the slowest samples above threshold times the overall median, as (rank, iteration, time)
+def outliers(times, threshold=2.0, top=20):
+    times = np.asarray(times)
+    cutoff = threshold*float(np.median(times))
+    ranks, iters = np.nonzero(times > cutoff)
+    values = times[ranks, iters]
+    order = np.argsort(values)[::-1][:top]
+    return cutoff, [(int(ranks[k]), int(iters[k]), float(values[k])) for k in order]
+
+
+# for every iteration with a slow sample, count how many ranks were slow : when only one rank
+# is slow it is a local straggler, and when more than one and most ranks are slow in the same
+# iteration the event is network-wide ; the three categories never overlap
+def classify_slow_iterations(times, threshold=2.0, wide_fraction=0.5):
+    times = np.asarray(times)
+    nranks = times.shape[0]
+    slow = times > threshold*float(np.median(times))
+    slow_per_iter = slow.sum(axis=0)
+    iters = np.nonzero(slow_per_iter)[0]
+    counts = slow_per_iter[iters]
+
+    single = iters[counts == 1]
+    wide = iters[(counts > 1) & (counts >= wide_fraction*nranks)]
+    partial = iters[(counts > 1) & (counts < wide_fraction*nranks)]
+
+    # ranks that are slow on their own, most frequent first
+    lone_ranks = np.argmax(slow[:, single], axis=0) if single.size > 0 else np.empty(0, dtype=np.int64)
+    rank_counts = np.bincount(lone_ranks, minlength=nranks)
+    stragglers = [(int(r), int(rank_counts[r])) for r in np.argsort(rank_counts)[::-1] if rank_counts[r] > 0]
+
+    return {"slow_iterations": iters, "wide": wide, "partial": partial, "single": single, "stragglers": stragglers}
+
+
+# entry and exit are (ranks, iterations) timestamps on a common clock ; a collective is slow when
+# the span from the first entry to the last exit is above threshold times the median span, and the
+# rank that entered last is the one that delayed it.  Returns the cutoff, the slowest iterations as
+# (iteration, span, rank, host, lateness), and how often each rank was the last to enter.
+def straggler_report(entry, exit, hosts=None, threshold=2.0, top=20):
+    entry = np.asarray(entry)
+    exit = np.asarray(exit)
+    span = exit.max(axis=0) - entry.min(axis=0)
+    cutoff = threshold*float(np.median(span))
+
+    late_rank = entry.argmax(axis=0)
+    lateness = entry.max(axis=0) - np.median(entry, axis=0)
+
+    slow = np.nonzero(span > cutoff)[0]
+    order = slow[np.argsort(span[slow])[::-1]][:top]
+    rows = []
+    for i in order:
+        r = int(late_rank[i])
+        rows.append((int(i), float(span[i]), r, hosts[r] if hosts is not None else "", float(lateness[i])))
+
+    counts = np.bincount(late_rank[slow], minlength=entry.shape[0])
+    culprits = [(int(r), int(counts[r])) for r in np.argsort(counts)[::-1] if counts[r] > 0]
+    return cutoff, rows, culprits
+
+
+def print_straggler_report(cutoff, rows, culprits, top=20, file=None):
+    print("collectives slower than ", "{:.3f}".format(1.0e3*cutoff), " msec from first entry to last exit", file=file)
+    print("   iteration   span(msec)    rank   late by(msec)   node", file=file)
+    for i, span, r, host, late in rows:
+        print("{:12d}".format(i), "{:12.3f}".format(1.0e3*span), "{:7d}".format(r), "{:15.3f}".format(1.0e3*late), "  ", host, file=file)
+    if len(culprits) > 0:
+        print("ranks that entered last in slow collectives : rank (count)", file=file)
+        for r, n in culprits[:top]:
+            print("   ", r, "(" + str(n) + ")", file=file)
+    print("", file=file)
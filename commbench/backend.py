@@ -0,0 +1,75 @@
+#
+# Copyright IBM Corp. 2024
+# SPDX-License-Identifier: MIT
+#
+
+import os
+import sys
+import time
+import torch
+import torch.distributed as dist
+
+
+def add_backend_args(parser):
+    parser.add_argument("--backend", choices=["nccl", "gloo", "mpi"], default="nccl")
+    parser.add_argument("--device", choices=["cuda", "cpu"], default="cuda")
+
+
+class Backend:
+    # process-group backend plus the device that holds the communication buffers
+
+    def __init__(self, name, device_type):
+        self.start_time = time.perf_counter()
+
+        if name == "nccl" and device_type != "cuda":
+            sys.exit("the nccl backend requires --device cuda")
+        if name == "mpi" and not dist.is_mpi_available():
+            sys.exit("this PyTorch build does not include the mpi backend")
+        if device_type == "cuda" and not torch.cuda.is_available():
+            sys.exit("--device cuda was requested but no GPU is available")
+
+        self.name = name
+        self.device_type = device_type
+        self.local_rank = int(os.environ.get("LOCAL_RANK", 0))
+
+        if device_type == "cuda":
+            torch.cuda.set_device(self.local_rank)
+            self.device = torch.device("cuda", self.local_rank)
+        else:
+            self.device = torch.device("cpu")
+
+        t1 = time.perf_counter()
+        dist.init_process_group(name)
+        self.init_time = time.perf_counter() - t1
+
+        # the mpi backend takes rank and size from the MPI launcher, so ask torch.distributed
+        self.rank = dist.get_rank()
+        self.world_size = dist.get_world_size()
+
+        if "LOCAL_WORLD_SIZE" in os.environ:
+            self.local_size = int(os.environ["LOCAL_WORLD_SIZE"])
+        elif device_type == "cuda":
+            self.local_size = torch.cuda.device_count()
+        else:
+            self.local_size = 1
+
+    # cuda collectives are asynchronous with respect to the host, so wait for the device;
+    # blocking gloo and mpi calls on host tensors have already completed when they return
+    def synchronize(self):
+        if self.device_type == "cuda":
+            torch.cuda.synchronize()
+
+    def version(self):
+        if self.name == "nccl":
+            version = torch.cuda.nccl.version()
+            if isinstance(version, tuple):
+                version = ".".join(str(v) for v in version)
+            return "NCCL " + str(version)
+        return self.name + " (torch " + torch.__version__ + ")"
+
+    def destroy(self):
+        dist.destroy_process_group()
+
+
+def init(args):
+    return Backend(args.backend, args.device)
@@ -0,0 +1,132 @@
+#
+# Copyright IBM Corp. 2024
+# SPDX-License-Identifier: MIT
+#
+
+import sys
+import time
+import collections
+import torch
+
+
+# the element types that can be swept with --dtype
+DTYPES = {"fp32": torch.float32, "bf16": torch.bfloat16, "fp16": torch.float16, "int8": torch.int8, "fp64": torch.float64}
+
+
+def add_buffer_args(parser):
+    parser.add_argument("--fill", choices=["zeros", "random", "none"], default="zeros")
+
+
+def add_dtype_args(parser):
+    parser.add_argument("--dtype", type=str, default="fp32")
+
+
+# (name, dtype, bytes per element) for every entry in the comma-separated --dtype list
+def dtypes(args):
+    names = [name.strip() for name in args.dtype.split(",") if name.strip()]
+    for name in names:
+        if name not in DTYPES:
+            sys.exit("unknown dtype " + name + " : choose from " + ",".join(DTYPES))
+    return [(name, DTYPES[name], torch.empty(0, dtype=DTYPES[name]).element_size()) for name in names]
+
+
+# the data values do not change the communication time, so a random fill is optional ;
+# "zeros" is a cheap memset that avoids denormals and NaNs in reductions on host tensors
+def allocate(n, device, fill="zeros", dtype=torch.float32):
+    if fill == "random":
+        return torch.rand(n, dtype=dtype, device=device)
+    elif fill == "zeros":
+        return torch.zeros(n, dtype=dtype, device=device)
+    return torch.empty(n, dtype=dtype, device=device)
+
+
+class BufferPool:
+    # one preallocated buffer carved into aligned regions, one region per role (for example
+    # "input" and "output", or one per in-flight slot) ; every size in a sweep gets views into
+    # the same regions, so there is no allocate/fill/free cycle per size
+
+    def __init__(self, comm, fill="zeros", align=512):
+        self.comm = comm
+        self.fill = fill
+        self.align = align
+        self.sizes = {}
+        self.offsets = {}
+        self.requested = 0
+        self.counts = collections.Counter()
+        self.flat = None
+        self.alloc_time = 0.0
+        self.per_size_time = 0.0
+        self.measured = 0
+
+    # declare that role will need nbytes for one of the sizes in the sweep ; without the pool,
+    # every request would be its own allocate/fill/free cycle
+    def request(self, role, nbytes):
+        self.sizes[role] = max(self.sizes.get(role, 0), int(nbytes))
+        self.requested += int(nbytes)
+        self.counts[int(nbytes)] += 1
+
+    def allocate(self):
+        total = 0
+        for role in self.sizes:
+            self.offsets[role] = total
+            total += -(-self.sizes[role] // self.align)*self.align
+
+        self.comm.synchronize()
+        t1 = time.perf_counter()
+        self.flat = self._bytes(max(1, total))
+        self.comm.synchronize()
+        self.alloc_time = time.perf_counter() - t1
+        self.per_size_time = self._per_size_estimate()
+
+    # the regions are viewed as every dtype, at any byte offset, so a random fill is done per
+    # byte : with every byte below 0x40 the top byte of any element keeps the exponent short of
+    # all ones, which gives finite values of magnitude below 2 in every floating-point view
+    def _bytes(self, nbytes):
+        if self.fill == "random":
+            return torch.randint(0, 64, (nbytes,), dtype=torch.uint8, device=self.comm.device)
+        return allocate(nbytes, self.comm.device, self.fill, torch.uint8)
+
+    # what the sweep would spend without the pool : one allocate/fill/free cycle is timed for every
+    # distinct requested size up to measure_limit bytes, and counted once for every request of that
+    # size ; larger sizes, which could not be allocated next to the pool, are scaled by the rate of
+    # the largest measured one
+    def _per_size_estimate(self, measure_limit=512*1000*1000):
+        estimate = 0.0
+        rate = None
+        self.measured = 0
+        for nbytes in sorted(n for n in self.counts if n > 0):
+            if nbytes <= measure_limit:
+                cycle = self._cycle(nbytes)
+                rate = cycle/nbytes
+                self.measured += 1
+            else:
+                if rate is None:
+                    rate = self._cycle(measure_limit)/measure_limit
+                cycle = rate*nbytes
+            estimate += cycle*self.counts[nbytes]
+        return estimate
+
+    def _cycle(self, nbytes):
+        self.comm.synchronize()
+        t1 = time.perf_counter()
+        buf = self._bytes(nbytes)
+        self.comm.synchronize()
+        del buf
+        return time.perf_counter() - t1
+
+    def view(self, role, n, dtype=torch.float32):
+        nbytes = n*torch.empty(0, dtype=dtype).element_size()
+        if nbytes > self.sizes[role]:
+            raise ValueError("role " + str(role) + " needs " + str(nbytes) + " bytes but reserved " + str(self.sizes[role]))
+        offset = self.offsets[role]
+        return self.flat[offset:offset + nbytes].view(dtype)
+
+    def nbytes(self):
+        return 0 if self.flat is None else self.flat.numel()
+
+    def report(self):
+        nsizes = len([n for n in self.counts if n > 0])
+        return "buffer pool : " + "{:.1f}".format(1.0e-6*self.nbytes()) + " MB allocated in " + "{:.3f}".format(self.alloc_time) + \
+               " sec ; per-size allocation of " + "{:.1f}".format(1.0e-6*self.requested) + " MB in " + str(sum(self.counts.values())) + \
+               " buffers would take about " + "{:.3f}".format(self.per_size_time) + " sec (" + str(self.measured) + " of " + str(nsizes) + \
+               " sizes measured), saved " + "{:.3f}".format(self.per_size_time - self.alloc_time) + " sec"
@@ -0,0 +1,64 @@
+#
+# Copyright IBM Corp. 2024
+# SPDX-License-Identifier: MIT
+#
+
+import time
+import numpy as np
+import torch
+import torch.distributed as dist
+
+
+# a host-side group for the ping-pong exchanges, so that they do not set up nccl
+# point-to-point communicators between rank 0 and every other rank ; every rank must call this
+def host_group(comm):
+    if comm.name in ("gloo", "mpi"):
+        return None
+    return dist.new_group(backend="gloo")
+
+
+# ping-pong between rank 0 and each other rank in turn : rank 0 sends, the other rank replies with
+# its perf_counter() value, and the offset is the remote time minus the midpoint of the round trip,
+# taken from the exchange with the smallest round-trip time.  Returns, on every rank, the offsets
+# of every rank's clock relative to rank 0 and the rank-0 time at which the estimate was made.
+def estimate_offsets(comm, group=None, pings=10):
+    buf = torch.zeros(1, dtype=torch.float64)
+    offsets = torch.zeros(comm.world_size, dtype=torch.float64)
+
+    for r in range(1, comm.world_size):
+        if comm.rank == 0:
+            best = 1.0e30
+            for k in range(pings):
+                t1 = time.perf_counter()
+                dist.send(buf, r, group=group)
+                dist.recv(buf, r, group=group)
+                t2 = time.perf_counter()
+                if (t2 - t1) < best:
+                    best = t2 - t1
+                    offsets[r] = float(buf[0]) - 0.5*(t1 + t2)
+        elif comm.rank == r:
+            for k in range(pings):
+                dist.recv(buf, 0, group=group)
+                buf[0] = time.perf_counter()
+                dist.send(buf, 0, group=group)
+
+    reference = torch.tensor([time.perf_counter()], dtype=torch.float64)
+    dist.broadcast(offsets, 0, group=group)
+    dist.broadcast(reference, 0, group=group)
+    return offsets.numpy(), float(reference[0])
+
+
+# map local timestamps, shaped (ranks, ...), onto rank 0's clock ; the offsets measured before and
+# after the run are interpolated linearly in time to follow clock drift
+def align(stamps, before, after):
+    stamps = np.asarray(stamps, dtype=np.float64)
+    off_b, ref_b = before
+    off_a, ref_a = after
+    shape = (-1,) + (1,)*(stamps.ndim - 1)
+    off_b = off_b.reshape(shape)
+    off_a = off_a.reshape(shape)
+
+    local_b = ref_b + off_b
+    local_a = ref_a + off_a
+    frac = (stamps - local_b)/np.maximum(local_a - local_b, 1.0e-9)
+    return stamps - (off_b + frac*(off_a - off_b))
@@ -0,0 +1,66 @@
+#
+# Copyright IBM Corp. 2024
+# SPDX-License-Identifier: MIT
+#
+
+import numpy as np
+import torch
+import torch.distributed as dist
+
+
+class GroupTimes:
+    # the average, min, and max time for this rank's own group at every size in the sweep ;
+    # everything is gathered to rank 0 in one collective after the sweep, instead of each group
+    # leader appending to its own text file at every size
+
+    def __init__(self, sweep):
+        self.sweep = list(sweep)
+        self.data = np.zeros((len(self.sweep), 3), dtype=np.float64)
+
+    def record(self, k, times):
+        self.data[k] = [np.mean(times), np.min(times), np.max(times)]
+
+    # returns the (ranks, sizes, 3) array on rank 0 and None elsewhere
+    def gather(self, comm):
+        local = torch.from_numpy(self.data.reshape(-1)).to(comm.device)
+        everything = torch.empty(comm.world_size*local.numel(), dtype=torch.float64, device=comm.device)
+        dist.all_gather_into_tensor(everything, local)
+        comm.synchronize()
+        if comm.rank != 0:
+            return None
+        return everything.cpu().numpy().reshape(comm.world_size, len(self.sweep), 3)
+
+
+# one row per group, using the times reported by the group leader (the lowest rank in the group),
+# with the slowdown at each size relative to the median over all groups ; sorted slowest first
+def slowdown_table(gathered, group_ranks):
+    leaders = np.array([min(ranks) for ranks in group_ranks])
+    tavg = gathered[leaders, :, 0]
+    slowdown = tavg/np.median(tavg, axis=0)
+
+    rows = []
+    for g in range(len(group_ranks)):
+        worst = int(np.argmax(slowdown[g]))
+        rows.append({"group": g, "leader": int(leaders[g]), "mean_slowdown": float(slowdown[g].mean()),
+                     "max_slowdown": float(slowdown[g, worst]), "worst_size": worst,
+                     "tavg": gathered[leaders[g], :, 0], "tmin": gathered[leaders[g], :, 1], "tmax": gathered[leaders[g], :, 2]})
+    rows.sort(key=lambda row: row["mean_slowdown"], reverse=True)
+    return rows
+
+
+def write_table(path, rows, sweep, header=""):
+    with open(path, "w") as f:
+        if header:
+            print(header, file=f)
+        print("# groups ranked by mean slowdown relative to the median group ; times in usec", file=f)
+        print("# group   leader   mean_slowdown   max_slowdown   at_size(MB)", file=f)
+        for row in rows:
+            print("{:7d}".format(row["group"]), "{:8d}".format(row["leader"]), "{:15.3f}".format(row["mean_slowdown"]),
+                  "{:14.3f}".format(row["max_slowdown"]), "{:13.2f}".format(sweep[row["worst_size"]]), file=f)
+        print("", file=f)
+        print("# per-size times for each group : size(MB)  tavg  tmin  tmax", file=f)
+        for row in rows:
+            print("# group ", row["group"], " leader ", row["leader"], file=f)
+            for k in range(len(sweep)):
+                print("{:8.2f}".format(sweep[k]), "{:12.1f}".format(1.0e6*row["tavg"][k]), "{:12.1f}".format(1.0e6*row["tmin"][k]),
+                      "{:12.1f}".format(1.0e6*row["tmax"][k]), file=f)
@@ -0,0 +1,85 @@
+#
+# Copyright IBM Corp. 2024
+# SPDX-License-Identifier: MIT
+#
+
+import sys
+import numpy as np
+
+
+def add_param_args(parser):
+    parser.add_argument("--layers", type=int, default=24)
+    parser.add_argument("--hidden", type=int, default=1024)
+    parser.add_argument("--vocab", type=int, default=50304)
+    parser.add_argument("--shapes-file", type=str, default=None)
+
+
+# the number of elements in every parameter tensor, in model order : the shapes in --shapes-file,
+# one per line such as "1024,4096" or "1024x4096", or else a GPT-style transformer
+def tensor_sizes(args):
+    if args.shapes_file is not None:
+        return read_shapes(args.shapes_file)
+    return transformer_sizes(args.layers, args.hidden, args.vocab)
+
+
+# the element counts of the shapes on every line of a shapes file, such as "1024,4096" or
+# "1024x4096" ; a line may list several shapes separated by ";" and "#" starts a comment
+def read_shape_lines(path):
+    lines = []
+    with open(path) as f:
+        for line in f:
+            line = line.split("#")[0].strip()
+            if not line:
+                continue
+            counts = []
+            for shape in line.split(";"):
+                dims = [int(d) for d in shape.replace("x", ",").replace(" ", ",").split(",") if d]
+                counts.append(int(np.prod(dims)))
+            lines.append(counts)
+    if len(lines) == 0:
+        sys.exit("no tensor shapes in " + path)
+    return lines
+
+
+# one tensor for every shape in the file
+def read_shapes(path):
+    return np.array([n for counts in read_shape_lines(path) for n in counts], dtype=np.int64)
+
+
+# embedding, then for every layer the attention and MLP weights and biases and two layer norms,
+# then the final layer norm
+def transformer_sizes(layers, hidden, vocab):
+    h = hidden
+    layer = [h, h, 3*h*h, 3*h, h*h, h, h, h, 4*h*h, 4*h, 4*h*h, h]
+    return np.array([vocab*h] + layer*layers + [h, h], dtype=np.int64)
+
+
+# contiguous (start, stop) element ranges of the flat parameter buffer, filled from the last
+# tensor to the first as DDP does, so that the gradients that are ready first go in the first
+# bucket ; a bucket is closed when the next tensor would take it past cap elements
+def buckets(counts, cap):
+    offsets = np.concatenate(([0], np.cumsum(counts)))
+    ranges = []
+    stop = int(offsets[-1])
+    start = stop
+    for t in range(len(counts) - 1, -1, -1):
+        if start < stop and stop - int(offsets[t]) > cap:
+            ranges.append((start, stop))
+            stop = start
+        start = int(offsets[t])
+    ranges.append((start, stop))
+    return ranges
+
+
+# the number of elements in every FSDP unit : one unit per line of --shapes-file, where a line
+# may list several shapes separated by ";", or else the embedding and then one unit per layer,
+# with the final layer norm in the last one
+def unit_sizes(args):
+    if args.shapes_file is not None:
+        return np.array([sum(counts) for counts in read_shape_lines(args.shapes_file)], dtype=np.int64)
+
+    h = args.hidden
+    layer = int(transformer_sizes(1, h, args.vocab)[1:-2].sum())
+    counts = np.array([args.vocab*h] + [layer]*args.layers, dtype=np.int64)
+    counts[-1] += 2*h
+    return counts
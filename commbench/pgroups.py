@@ -0,0 +1,79 @@
+#
+# Copyright IBM Corp. 2024
+# SPDX-License-Identifier: MIT
+#
+
+import inspect
+import time
+import torch
+import torch.distributed as dist
+
+
+def add_group_args(parser):
+    parser.add_argument("--group-init", choices=["auto", "local", "enumerate", "all"], default="auto")
+
+
+class ProcessGroups:
+    # process groups are created lazily, only for the kinds of group that a benchmark uses ;
+    # "local" creates just this rank's group with use_local_synchronization, so only its members
+    # take part, "enumerate" creates every group of a kind in one new_subgroups_by_enumeration
+    # call, and "all" calls new_group for every group as before.  "auto" picks "local" when the
+    # installed PyTorch supports it.  The time for each step is kept for the startup report.
+
+    def __init__(self, comm, topo, method="auto"):
+        self.comm = comm
+        self.topo = topo
+        if method == "auto":
+            local = "use_local_synchronization" in inspect.signature(dist.new_group).parameters
+            method = "local" if local else "enumerate"
+        self.method = method
+        self.cache = {}
+        self.startup = [("init_process_group", comm.init_time)]
+
+    # this rank's group of the given kind and its list of ranks ; every rank must call this
+    def get(self, kind):
+        if kind in self.cache:
+            return self.cache[kind]
+
+        t1 = time.perf_counter()
+        index, mine = self.topo.group_of(kind, self.comm.rank)
+        ranks = mine.tolist()
+
+        if len(ranks) == self.comm.world_size:
+            group = None
+        elif self.method == "local":
+            group = dist.new_group(ranks, use_local_synchronization=True)
+        elif self.method == "enumerate":
+            group, subgroups = dist.new_subgroups_by_enumeration(self.topo.groups(kind).tolist())
+        else:
+            for members in self.topo.groups(kind).tolist():
+                g = dist.new_group(members)
+                if self.comm.rank in members:
+                    group = g
+
+        self.startup.append(("create " + kind + " groups", time.perf_counter() - t1))
+        self.cache[kind] = (group, ranks)
+        return self.cache[kind]
+
+    # time one small collective on the group, which is when nccl sets up its communicator
+    def first_call(self, kind):
+        group, ranks = self.get(kind)
+        x = torch.zeros(1, device=self.comm.device)
+        t1 = time.perf_counter()
+        dist.all_reduce(x, group=group)
+        self.comm.synchronize()
+        self.startup.append(("first call on " + kind, time.perf_counter() - t1))
+
+    # the max over ranks of every startup step and of the time to the first measurement ;
+    # every rank must call this, and rank 0 prints the table
+    def report(self, file=None):
+        names = [name for name, seconds in self.startup] + ["time to first measurement"]
+        values = [seconds for name, seconds in self.startup] + [time.perf_counter() - self.comm.start_time]
+        t = torch.tensor(values, dtype=torch.float64, device=self.comm.device)
+        dist.all_reduce(t, op=dist.ReduceOp.MAX)
+        t = t.cpu()
+        if self.comm.rank == 0:
+            print("startup cost (max over ranks), group init = ", self.method, file=file)
+            for k in range(len(names)):
+                print("   ", "{:32s}".format(names[k]), "{:10.3f}".format(float(t[k])), " sec", file=file)
+            print(" ", file=file)
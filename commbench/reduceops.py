@@ -0,0 +1,35 @@
+#
+# Copyright IBM Corp. 2024
+# SPDX-License-Identifier: MIT
+#
+
+import sys
+import torch.distributed as dist
+
+# the reduction operators that can be swept with --ops ; avg and premul_sum are nccl only
+OPS = ["sum", "avg", "max", "min", "premul_sum"]
+
+
+def add_op_args(parser):
+    parser.add_argument("--ops", type=str, default="sum")
+
+
+# (name, ReduceOp) for every entry in the comma-separated --ops list ; premul_sum scales the
+# input by 1/group_size before the sum, as for gradients that are averaged over the group.
+# Every op must be valid for every dtype in the sweep, so bad pairs stop the run before it starts.
+def ops(args, comm, dtypes, group_size):
+    names = [name.strip() for name in args.ops.split(",") if name.strip()]
+    chosen = []
+    for name in names:
+        if name not in OPS:
+            sys.exit("unknown reduction op " + name + " : choose from " + ",".join(OPS))
+        if name in ("avg", "premul_sum") and comm.name != "nccl":
+            sys.exit("reduction op " + name + " needs the nccl backend")
+        if name == "premul_sum":
+            for dtype_name, dtype, esize in dtypes:
+                if not dtype.is_floating_point:
+                    sys.exit("reduction op premul_sum needs a floating-point dtype, not " + dtype_name + " : drop one of them from --dtype or --ops")
+            chosen.append((name, dist._make_nccl_premul_sum(1.0/group_size)))
+        else:
+            chosen.append((name, getattr(dist.ReduceOp, name.upper())))
+    return chosen
@@ -0,0 +1,161 @@
+#
+# Copyright IBM Corp. 2024
+# SPDX-License-Identifier: MIT
+#
+
+import csv
+import json
+import os
+import queue
+import socket
+import sys
+import threading
+import time
+import torch
+import torch.distributed as dist
+from commbench import timing
+
+# environment variables that change communication performance, recorded with every result
+ENV_PREFIXES = ("NCCL_", "TORCH_NCCL_", "TORCH_DISTRIBUTED_", "GLOO_", "UCX_", "FI_", "CUDA_", "OMP_", "MASTER_")
+
+# the CSV columns, in order, ahead of the run metadata ; records may leave any of them empty
+RECORD_FIELDS = ["collective", "size_MB", "bytes", "dtype", "op", "group", "group_size", "timer", "iterations",
+                 "tavg_usec", "tmin_usec", "tmax_usec", "p50_usec", "p99_usec", "avgbw_GBs", "maxbw_GBs", "minbw_GBs",
+                 "group_index", "leader", "mean_slowdown", "concurrent_with", "slowdown",
+                 "overlap_efficiency", "compute_slowdown",
+                 "splits", "imbalance", "imbalance_cost", "stage", "link", "cross_node",
+                 "method", "bucket_MB", "calls", "prefetch", "exposed_usec",
+                 "recorded_usec", "replay_ratio"]
+
+
+def add_results_args(parser):
+    parser.add_argument("--results", type=str, default=None)
+    parser.add_argument("--results-format", choices=["jsonl", "csv", "parquet"], default=None)
+
+
+# run metadata shared by every record ; this calls all_gather_object, so every rank must call it
+def run_metadata(comm, **extra):
+    hostnames = [None]*comm.world_size
+    dist.all_gather_object(hostnames, socket.gethostname())
+
+    meta = {}
+    meta["start_time"] = time.strftime("%Y-%m-%dT%H:%M:%S%z")
+    meta["command"] = " ".join(sys.argv)
+    meta["world_size"] = comm.world_size
+    meta["backend"] = comm.name
+    meta["device"] = comm.device_type
+    meta["backend_version"] = comm.version()
+    meta["torch_version"] = torch.__version__
+    meta["num_hosts"] = len(set(hostnames))
+    meta["hosts"] = sorted(set(hostnames))
+    meta["env"] = {k: v for k, v in sorted(os.environ.items()) if k.startswith(ENV_PREFIXES)}
+    meta.update(extra)
+    return meta
+
+
+class ResultsWriter:
+    # streams one record per (collective, size, group, timer) to JSONL or CSV from a background
+    # thread, so file-system latency never lands in the timed loop ; Parquet needs the whole
+    # table, so those records are written by close()
+
+    def __init__(self, path, fmt=None, meta=None):
+        self.path = path
+        self.meta = meta if meta is not None else {}
+        self.queue = None
+        if path is None:
+            return
+
+        if fmt is None:
+            fmt = os.path.splitext(path)[1].lstrip(".").lower()
+        if fmt not in ("jsonl", "csv", "parquet"):
+            sys.exit("unknown results format for " + path + " ; use --results-format jsonl, csv, or parquet")
+        if fmt == "parquet":
+            try:
+                import pyarrow
+            except ImportError:
+                sys.exit("--results-format parquet requires pyarrow")
+        self.fmt = fmt
+        self.rows = []
+
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self._drain, daemon=True)
+        self.thread.start()
+
+    def write(self, record):
+        if self.queue is not None:
+            row = dict(record)
+            row.update(self.meta)
+            self.queue.put(row)
+
+    def close(self):
+        if self.queue is not None:
+            self.queue.put(None)
+            self.thread.join()
+            self.queue = None
+
+    def _drain(self):
+        if self.fmt == "parquet":
+            while True:
+                row = self.queue.get()
+                if row is None:
+                    break
+                self.rows.append(row)
+            self._write_parquet()
+            return
+
+        with open(self.path, "w", newline="") as f:
+            writer = None
+            while True:
+                row = self.queue.get()
+                if row is None:
+                    break
+                if self.fmt == "jsonl":
+                    f.write(json.dumps(row) + "\n")
+                else:
+                    row = {k: (json.dumps(v) if isinstance(v, (list, dict)) else v) for k, v in row.items()}
+                    if writer is None:
+                        fields = RECORD_FIELDS + [k for k in row if k not in RECORD_FIELDS]
+                        writer = csv.DictWriter(f, fieldnames=fields, restval="", extrasaction="ignore")
+                        writer.writeheader()
+                    writer.writerow(row)
+                f.flush()
+
+    # every field of every record becomes a column, with None where a record leaves it out
+    def _write_parquet(self):
+        import pyarrow
+        import pyarrow.parquet
+        rows = [{k: (json.dumps(v) if isinstance(v, dict) else v) for k, v in row.items()} for row in self.rows]
+        fields = record_columns(rows)
+        table = pyarrow.Table.from_pydict({k: [row.get(k) for row in rows] for k in fields})
+        pyarrow.parquet.write_table(table, self.path)
+
+
+# the union of the fields in rows : the RECORD_FIELDS that appear, in order, then any other
+# fields in the order they are first seen
+def record_columns(rows):
+    seen = {}
+    for row in rows:
+        for k in row:
+            seen.setdefault(k, None)
+    return [k for k in RECORD_FIELDS if k in seen] + [k for k in seen if k not in RECORD_FIELDS]
+
+
+# a writer that streams on rank 0 and ignores records on every other rank, or everywhere
+# when --results was not given
+def open_writer(args, comm, **extra):
+    if args.results is None:
+        return ResultsWriter(None)
+    meta = run_metadata(comm, **extra)
+    if comm.rank != 0:
+        return ResultsWriter(None)
+    return ResultsWriter(args.results, args.results_format, meta)
+
+
+# the fields shared by every benchmark : times in usec and bandwidths in GB/sec
+def timing_record(times, nbytes):
+    tavg, tmin, tmax = timing.summarize(times)
+    p50, p99 = timing.percentiles(times)
+    return {"iterations": len(times),
+            "tavg_usec": 1.0e6*tavg, "tmin_usec": 1.0e6*tmin, "tmax_usec": 1.0e6*tmax,
+            "p50_usec": 1.0e6*p50, "p99_usec": 1.0e6*p99,
+            "avgbw_GBs": nbytes/tavg, "maxbw_GBs": nbytes/tmin, "minbw_GBs": nbytes/tmax}
@@ -0,0 +1,84 @@
+#
+# Copyright IBM Corp. 2024
+# SPDX-License-Identifier: MIT
+#
+
+import math
+import time
+import numpy as np
+import torch
+import torch.distributed as dist
+
+
+def add_sampling_args(parser):
+    parser.add_argument("--sampling", choices=["adaptive", "fixed"], default="adaptive")
+    parser.add_argument("--min-iter", type=int, default=5)
+    parser.add_argument("--max-iter", type=int, default=1000)
+    parser.add_argument("--rel-ci", type=float, default=0.02)
+    parser.add_argument("--time-budget", type=float, default=10.0)
+
+
+class Sampler:
+    # adaptive sampling keeps iterating a size until the 95% confidence interval of the mean is
+    # within rel_ci of the mean, or the time budget (seconds per size) or max_iter is reached ;
+    # iterations run in batches that at most double the sample count, and the ranks agree on
+    # the next batch with one small allreduce per batch, never per iteration
+
+    def __init__(self, comm, args):
+        self.comm = comm
+        self.mode = args.sampling
+        self.multiplier = args.multiplier
+        self.min_iter = max(2, args.min_iter*self.multiplier)
+        self.max_iter = max(self.min_iter, args.max_iter*self.multiplier)
+        self.rel_ci = args.rel_ci
+        self.time_budget = args.time_budget
+
+    # the original iteration tiers, used with --sampling fixed
+    def fixed_iterations(self, nMB):
+        if nMB < 10.0:
+            return 100*self.multiplier
+        elif nMB < 512.0:
+            return 20*self.multiplier
+        elif nMB < 2000.0:
+            return 10*self.multiplier
+        else:
+            return 5*self.multiplier
+
+    def run(self, timer, fn, nMB, barrier=None):
+        if self.mode == "fixed":
+            return timer.run(fn, self.fixed_iterations(nMB), barrier=barrier)
+
+        tbeg = time.perf_counter()
+        times = timer.run(fn, self.min_iter, barrier=barrier)
+
+        while True:
+            primary = times[timer.timers()[0]]
+            batch = self._agree(self._propose(primary, time.perf_counter() - tbeg))
+            if batch == 0:
+                break
+            more = timer.run(fn, batch, barrier=barrier, warmup=0)
+            for name in times:
+                times[name] = np.concatenate((times[name], more[name]))
+
+        return times
+
+    def _propose(self, samples, elapsed):
+        n = len(samples)
+        if n >= self.max_iter or elapsed >= self.time_budget:
+            return 0
+
+        mean = float(np.mean(samples))
+        halfwidth = 1.96*float(np.std(samples, ddof=1))/math.sqrt(n)
+        if halfwidth <= self.rel_ci*mean:
+            return 0
+
+        # samples needed for the target interval, assuming the spread stays the same
+        wanted = int(math.ceil(n*(halfwidth/(self.rel_ci*mean))**2)) - n
+        affordable = int((self.time_budget - elapsed)/(elapsed/n)) + 1
+        return max(1, min(wanted, n, affordable, self.max_iter - n))
+
+    # every rank must run the same number of iterations, so take the largest proposal
+    def _agree(self, batch):
+        proposal = torch.tensor([batch], dtype=torch.int64, device=self.comm.device)
+        dist.all_reduce(proposal, op=dist.ReduceOp.MAX)
+        return int(proposal.cpu()[0])
@@ -0,0 +1,68 @@
+#
+# Copyright IBM Corp. 2024
+# SPDX-License-Identifier: MIT
+#
+
+import math
+import sys
+
+# message sizes in MB, close to evenly spaced on a log scale with 10 points per decade
+DEFAULT_SIZES = [0.10,0.12,0.15,0.20,0.32,0.40,0.50,0.64,0.80,1.00,1.25,1.50,2.00,3.16,4.00,5.00,6.40,8.00,\
+                 10.0,12.5,15.0,20.0,31.6,40.0,50.0,64.0,80.0,100.0,125.0,160.0,200.0,250.0,316.0,400.0,500.0,640.0,800.0,\
+                 1000.0,1250.0,1600.0,2000.0,2500.0,3160.0,4000.0,5000.0,6400.0,8000.0]
+
+# activation-sized messages for tensor- and context-parallel traffic, about 5 KB to 250 MB
+ACTIVATION_MIN_SIZE = 0.005
+ACTIVATION_MAX_SIZE = 256.0
+
+
+def add_size_args(parser, min_size=0.1, max_size=8000.0):
+    parser.add_argument("--min-size", type=float, default=None)
+    parser.add_argument("--max-size", type=float, default=None)
+    parser.add_argument("--points-per-decade", type=int, default=None)
+    parser.add_argument("--sizes", type=str, default=None)
+    parser.add_argument("--sizes-file", type=str, default=None)
+    parser.set_defaults(default_min_size=min_size, default_max_size=max_size, default_grid=False)
+
+
+# switch the default sweep to a log-spaced grid of activation-sized messages ; explicit size
+# options still take precedence
+def use_activation_grid(args):
+    args.default_min_size = ACTIVATION_MIN_SIZE
+    args.default_max_size = ACTIVATION_MAX_SIZE
+    args.default_grid = True
+
+
+# the list of sizes in MB : an explicit list or file, a generated log-spaced grid if any of
+# the grid options were given, and otherwise the default list
+def sweep(args):
+    if args.sizes is not None:
+        sizes = [float(s) for s in args.sizes.split(",") if s.strip()]
+    elif args.sizes_file is not None:
+        sizes = []
+        with open(args.sizes_file) as f:
+            for line in f:
+                line = line.split("#")[0].replace(",", " ")
+                sizes.extend(float(s) for s in line.split())
+    elif args.min_size is not None or args.max_size is not None or args.points_per_decade is not None or args.default_grid:
+        sizes = log_grid(args.min_size if args.min_size is not None else args.default_min_size,
+                         args.max_size if args.max_size is not None else args.default_max_size,
+                         args.points_per_decade if args.points_per_decade is not None else 10)
+    else:
+        sizes = [s for s in DEFAULT_SIZES if args.default_min_size <= s <= args.default_max_size]
+
+    if len(sizes) == 0 or min(sizes) <= 0.0:
+        sys.exit("the size sweep must contain at least one positive size")
+    return sizes
+
+
+# sizes 10^(k/ppd) between smin and smax, rounded to three significant digits
+def log_grid(smin, smax, points_per_decade):
+    kmin = int(math.ceil(points_per_decade*math.log10(smin) - 1.0e-9))
+    kmax = int(math.floor(points_per_decade*math.log10(smax) + 1.0e-9))
+    sizes = []
+    for k in range(kmin, kmax + 1):
+        s = 10.0**(k/points_per_decade)
+        digits = 2 - int(math.floor(math.log10(s)))
+        sizes.append(round(s, digits))
+    return sizes
@@ -0,0 +1,40 @@
+#
+# Copyright IBM Corp. 2024
+# SPDX-License-Identifier: MIT
+#
+
+import numpy as np
+
+
+def add_split_args(parser):
+    parser.add_argument("--splits", choices=["uniform", "zipf", "both"], default="both")
+    parser.add_argument("--zipf-alpha", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=1235911)
+
+
+def distributions(args):
+    if args.splits == "both":
+        return ["uniform", "zipf"]
+    return [args.splits]
+
+
+# (nranks, nranks) element counts for all_to_all_single, where row r holds the input splits of
+# rank r and column r its output splits ; every rank sends the same number of elements.  For
+# "zipf" each destination gets a popularity weight 1/k^alpha, with the ranking k shuffled once
+# for the whole job, and each source draws its counts from those weights, as when tokens are
+# routed to a few popular experts.  Every rank builds the same matrix from the same seed.
+def split_matrix(nranks, total, distribution="uniform", alpha=1.0, seed=1235911):
+    per_dest = total // nranks
+    if distribution == "uniform":
+        return np.full((nranks, nranks), per_dest, dtype=np.int64)
+
+    rng = np.random.default_rng(seed)
+    weights = 1.0/np.arange(1, nranks + 1)**alpha
+    weights = weights[rng.permutation(nranks)]
+    return rng.multinomial(per_dest*nranks, weights/weights.sum(), size=nranks).astype(np.int64)
+
+
+# the busiest receiver relative to the average, 1.0 for uniform splits
+def imbalance(matrix):
+    received = matrix.sum(axis=0)
+    return float(received.max()/max(1.0, received.mean()))
@@ -0,0 +1,126 @@
+#
+# Copyright IBM Corp. 2024
+# SPDX-License-Identifier: MIT
+#
+
+import os
+import queue
+import struct
+import threading
+import numpy as np
+
+# raw format : a 64-byte header followed by little-endian float64 data in C order ;
+# the header is the magic string, a version, the number of dimensions, and up to six
+# dimensions as uint64, so the data can be memory-mapped at a fixed offset
+MAGIC = b"CBTIMES\0"
+# the same header with this magic marks iteration-major data, shaped (iterations, ranks),
+# which is written in chunks as a long run progresses
+MAGIC_APPEND = b"CBTIMEST"
+VERSION = 1
+HEADER_BYTES = 64
+MAX_DIMS = 6
+
+
+def format_for(path, fmt=None):
+    if fmt is not None:
+        return fmt
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".npy":
+        return "npy"
+    elif ext == ".txt":
+        return "txt"
+    return "raw"
+
+
+# write a float64 array, normally shaped (ranks, iterations), in one bulk operation
+def save(path, times, fmt=None):
+    times = np.ascontiguousarray(times, dtype="<f8")
+    fmt = format_for(path, fmt)
+    if fmt == "npy":
+        with open(path, "wb") as f:
+            np.save(f, times)
+    elif fmt == "txt":
+        # one value per line in rank-major order, as read by analyze.c
+        np.savetxt(path, times.reshape(-1), fmt="%.9e")
+    else:
+        if times.ndim > MAX_DIMS:
+            raise ValueError("the raw format supports at most " + str(MAX_DIMS) + " dimensions")
+        shape = list(times.shape) + [0]*(MAX_DIMS - times.ndim)
+        header = struct.pack("<8sII" + str(MAX_DIMS) + "Q", MAGIC, VERSION, times.ndim, *shape)
+        with open(path, "wb") as f:
+            f.write(header)
+            times.tofile(f)
+
+
+# memory-map a file written by save() ; text files are read into memory, with one row per rank
+# when the number of ranks is given
+def load(path, ranks=None):
+    with open(path, "rb") as f:
+        head = f.read(HEADER_BYTES)
+
+    if head.startswith(b"\x93NUMPY"):
+        return np.load(path, mmap_mode="r")
+
+    if head.startswith(MAGIC) or head.startswith(MAGIC_APPEND):
+        fields = struct.unpack("<8sII" + str(MAX_DIMS) + "Q", head)
+        if fields[1] != VERSION:
+            raise ValueError(path + " has unsupported version " + str(fields[1]))
+        shape = tuple(fields[3:3 + fields[2]])
+        times = np.memmap(path, dtype="<f8", mode="r", offset=HEADER_BYTES, shape=shape)
+        # iteration-major data is returned as a (ranks, iterations) view
+        if fields[0] == MAGIC_APPEND:
+            return times.T
+        return times
+
+    times = np.loadtxt(path, dtype=np.float64, ndmin=1)
+    if ranks is not None:
+        return times.reshape(ranks, -1)
+    return times.reshape(1, -1)
+
+
+class Appender:
+    # appends (ranks, chunk) blocks of times to an iteration-major raw file from a background
+    # thread ; the header is rewritten after every block, so the file can be analyzed while
+    # the run is still going, and the bounded queue keeps memory use constant.  The optional
+    # report(block, *extra) is also called from the thread, after each block is written, so
+    # statistics over a block stay off the caller's path
+
+    def __init__(self, path, ranks, depth=4, report=None):
+        self.path = path
+        self.ranks = ranks
+        self.iterations = 0
+        self.report = report
+        self.file = open(path, "wb")
+        self._write_header()
+        self.queue = queue.Queue(maxsize=depth)
+        self.thread = threading.Thread(target=self._drain, daemon=True)
+        self.thread.start()
+
+    # the block is kept until it is written, so the caller must not reuse it
+    def append(self, block, *extra):
+        self.queue.put((block, extra))
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+        self.file.close()
+
+    def _write_header(self):
+        shape = [self.iterations, self.ranks] + [0]*(MAX_DIMS - 2)
+        self.file.seek(0)
+        self.file.write(struct.pack("<8sII" + str(MAX_DIMS) + "Q", MAGIC_APPEND, VERSION, 2, *shape))
+
+    def _drain(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            block, extra = item
+            data = np.array(block, dtype="<f8").T.copy()
+            self.file.seek(0, os.SEEK_END)
+            data.tofile(self.file)
+            self.iterations += data.shape[0]
+            self._write_header()
+            self.file.flush()
+            if self.report is not None:
+                self.report(block, *extra)
@@ -0,0 +1,137 @@
+#
+# Copyright IBM Corp. 2024
+# SPDX-License-Identifier: MIT
+#
+
+import time
+import numpy as np
+import torch
+
+
+def add_timing_args(parser):
+    parser.add_argument("--timer", choices=["device", "host", "both"], default="both")
+
+
+class Timer:
+    # the host timer puts perf_counter() around each call plus a synchronize, so it includes
+    # launch and sync overhead ; the device timer brackets each call with cuda events that are
+    # launched back to back, or for host tensors it takes the completion time of the async work
+    # handle, so it reflects the collective itself
+
+    def __init__(self, comm, mode="both"):
+        self.comm = comm
+        self.mode = mode
+        self.use_events = comm.device_type == "cuda"
+
+    def timers(self):
+        if self.mode == "both":
+            return ["device", "host"]
+        return [self.mode]
+
+    # fn(async_op) launches one collective and returns the work handle when async_op is True ;
+    # barrier, if given, is called between iterations so that all groups start together
+    def run(self, fn, maxiter, barrier=None, warmup=2):
+        for i in range(warmup):
+            fn(False)
+            self.comm.synchronize()
+
+        # with a barrier, "group" holds the time for this rank's own collective before the barrier
+        times = {}
+        if self.mode in ("device", "both"):
+            times["device"] = self._device_loop(fn, maxiter, barrier)
+        if self.mode in ("host", "both"):
+            times["host"], group = self._host_loop(fn, maxiter, barrier)
+        else:
+            group = times["device"]
+        if barrier is not None:
+            times["group"] = group
+        return times
+
+    # fn(slot, async_op) launches one collective on the buffers for the given slot ; depth
+    # collectives are kept outstanding on separate buffers and the host waits only at the end
+    # of each window, so the result is the sustained time per call for every window
+    def run_inflight(self, fn, depth, maxiter):
+        for slot in range(depth):
+            fn(slot, False)
+        self.comm.synchronize()
+
+        nwindows = max(1, maxiter // depth)
+        window = np.empty(nwindows, dtype=np.float64)
+
+        t1 = time.perf_counter()
+        for w in range(nwindows):
+            works = [fn(slot, True) for slot in range(depth)]
+            for work in works:
+                work.wait()
+            self.comm.synchronize()
+            t2 = time.perf_counter()
+            window[w] = (t2 - t1)/depth
+            t1 = t2
+
+        return window
+
+    def _host_loop(self, fn, maxiter, barrier):
+        host = np.empty(maxiter, dtype=np.float64)
+        group = np.empty(maxiter, dtype=np.float64)
+
+        t1 = time.perf_counter()
+        for i in range(maxiter):
+            fn(False)
+            self.comm.synchronize()
+            group[i] = time.perf_counter() - t1
+            if barrier is not None:
+                barrier()
+            t2 = time.perf_counter()
+            host[i] = t2 - t1
+            t1 = t2
+
+        return host, group
+
+    def _device_loop(self, fn, maxiter, barrier):
+        device = np.empty(maxiter, dtype=np.float64)
+
+        if self.use_events:
+            starts = [torch.cuda.Event(enable_timing=True) for i in range(maxiter)]
+            stops = [torch.cuda.Event(enable_timing=True) for i in range(maxiter)]
+            for i in range(maxiter):
+                if barrier is not None:
+                    barrier()
+                starts[i].record()
+                fn(False)
+                stops[i].record()
+            self.comm.synchronize()
+            for i in range(maxiter):
+                device[i] = 1.0e-3*starts[i].elapsed_time(stops[i])
+        else:
+            for i in range(maxiter):
+                if barrier is not None:
+                    barrier()
+                t1 = time.perf_counter()
+                work = fn(True)
+                device[i] = completion_time(work) - t1
+
+        return device
+
+
+# wall-clock time at which an async work handle completed, recorded by a callback on its
+# future so that it does not include the time for the waiting thread to wake up
+def completion_time(work):
+    stamp = work.get_future().then(lambda f: time.perf_counter())
+    return stamp.wait()
+
+
+def summarize(times):
+    return float(np.mean(times)), float(np.min(times)), float(np.max(times))
+
+
+# median and tail latency, for the small latency-bound messages
+def percentiles(times):
+    p50, p99 = np.percentile(times, [50.0, 99.0])
+    return float(p50), float(p99)
+
+
+# per-iteration maximum over all ranks, for benchmarks where many groups run at the same time
+def slowest(times, comm):
+    t = torch.from_numpy(times).to(comm.device)
+    torch.distributed.all_reduce(t, op=torch.distributed.ReduceOp.MAX)
+    return t.cpu().numpy()
@@ -0,0 +1,92 @@
+#
+# Copyright IBM Corp. 2024
+# SPDX-License-Identifier: MIT
+#
+
+import sys
+import numpy as np
+
+# grid dimensions : tensor, context, expert, data, and pipeline parallel ; the expert dimension
+# splits the data-parallel ranks, so the dense data-parallel group spans both "e" and "d"
+DIMS = "tcedp"
+NAMES = {"t": "tensor", "c": "context", "e": "expert", "d": "data", "p": "pipeline"}
+
+# the grid dimensions that make up each kind of group
+KINDS = {"tensor": "t", "context": "c", "expert": "e", "data": "ed", "expert_data": "d",
+         "pipeline": "p", "model": "tp"}
+
+
+def add_topology_args(parser):
+    parser.add_argument("-t", "--tensor_parallel", type=int, default=1)
+    parser.add_argument("-p", "--pipeline_parallel", type=int, default=1)
+    parser.add_argument("-x", "--context_parallel", type=int, default=1)
+    parser.add_argument("-e", "--expert_parallel", type=int, default=1)
+    parser.add_argument("-o", "--order", type=str, default="tdp")
+    parser.add_argument("--print-groups", action="store_true")
+
+
+class Topology:
+    # the rank grid as an N-D array ; order lists the dimensions from fastest to slowest varying,
+    # so "tdp" means rank = t + d*tp_size + p*tp_size*dp_size.  Every kind of group is a
+    # transpose and reshape of the grid, with no Python loops over ranks.
+
+    def __init__(self, world_size, tp_size=1, pp_size=1, cp_size=1, ep_size=1, order="tdp"):
+        self.world_size = world_size
+        self.order = order
+
+        if world_size % (tp_size*cp_size*pp_size) != 0:
+            sys.exit("world size " + str(world_size) + " is not divisible by tp*cp*pp = " + str(tp_size*cp_size*pp_size))
+        dp_size = world_size // (tp_size*cp_size*pp_size)
+        if dp_size % ep_size != 0:
+            sys.exit("the data-parallel size " + str(dp_size) + " is not divisible by ep = " + str(ep_size))
+
+        self.sizes = {"t": tp_size, "c": cp_size, "e": ep_size, "d": dp_size // ep_size, "p": pp_size}
+        self.dp_size = dp_size
+
+        if len(set(order)) != len(order) or any(a not in DIMS for a in order):
+            sys.exit("--order must be a permutation of some of the letters " + DIMS)
+        missing = [a for a in DIMS if a not in order]
+        for a in missing:
+            if self.sizes[a] > 1:
+                sys.exit("--order " + order + " does not place the " + NAMES[a] + " dimension (letter " + a + ")")
+        # size-one dimensions can go anywhere, so put them last
+        self.full_order = order + "".join(missing)
+
+        # grid axes run from the slowest to the fastest varying dimension
+        self.axes = self.full_order[::-1]
+        self.grid = np.arange(world_size).reshape([self.sizes[a] for a in self.axes])
+
+    def size(self, kind):
+        return int(np.prod([self.sizes[a] for a in KINDS[kind]]))
+
+    # (number of groups, group size) array of ranks, with the slowest varying dimensions outermost,
+    # so that groups and the ranks within them come out in the same order as the nested loops did
+    def groups(self, kind):
+        members = [i for i, a in enumerate(self.axes) if a in KINDS[kind]]
+        others = [i for i, a in enumerate(self.axes) if a not in KINDS[kind]]
+        return self.grid.transpose(others + members).reshape(-1, self.size(kind))
+
+    # the coordinates of a rank along every dimension
+    def coords(self, rank):
+        return dict(zip(self.axes, (int(i) for i in np.unravel_index(rank, self.grid.shape))))
+
+    # the group of the given kind that contains rank, and its index
+    def group_of(self, kind, rank):
+        groups = self.groups(kind)
+        index = int(np.nonzero((groups == rank).any(axis=1))[0][0])
+        return index, groups[index]
+
+    def describe(self, kinds, print_groups=False, limit=4, file=None):
+        for a in DIMS:
+            print("{:8s}".format(NAMES[a]), " size = ", self.sizes[a], file=file)
+        print("order (fastest first) = ", self.full_order, file=file)
+        print(" ", file=file)
+        for kind in kinds:
+            groups = self.groups(kind)
+            print("{:11s}".format(kind), " groups : ", groups.shape[0], " of size ", groups.shape[1], file=file)
+            shown = groups if print_groups else groups[0:limit]
+            for ranks in shown:
+                print("   ", ranks.tolist(), file=file)
+            if len(shown) < len(groups):
+                print("    ...", file=file)
+        print(" ", file=file)
@@ -0,0 +1,139 @@
+#
+# Copyright IBM Corp. 2024
+# SPDX-License-Identifier: MIT
+#
+
+import ast
+import json
+import sys
+
+# a trace is a list of calls, one JSON object per line :
+#   {"op": "allreduce", "count": 1048576, "dtype": "bf16", "group": "data", "gap_us": 35.0, "time_us": 410.0}
+# count is the number of input elements on each rank, group is a kind of group from the topology
+# (or "world"), or else group_size and optionally ranks pick the group, gap_us is the host time
+# from the end of the previous call to the start of this one, and time_us is the recorded time
+OPS = ["allreduce", "allgather", "reduce_scatter", "alltoall", "broadcast", "barrier"]
+
+# the dtype names of buffers.DTYPES ; a barrier carries no payload, so its dtype may be left out
+DTYPES = ["fp32", "bf16", "fp16", "int8", "fp64"]
+
+# collective names in torch profiler traces, from the record_param_comms events
+PROFILER_OPS = {"allreduce": "allreduce", "all_reduce": "allreduce", "allgather": "allgather", "all_gather": "allgather",
+                "_allgather_base": "allgather", "allgather_into_tensor": "allgather", "all_gather_into_tensor": "allgather",
+                "reduce_scatter": "reduce_scatter", "_reduce_scatter_base": "reduce_scatter", "reduce_scatter_tensor": "reduce_scatter",
+                "all_to_all": "alltoall", "alltoall": "alltoall", "alltoall_base": "alltoall", "all_to_all_single": "alltoall",
+                "broadcast": "broadcast", "barrier": "barrier"}
+
+PROFILER_DTYPES = {"Float": "fp32", "BFloat16": "bf16", "Half": "fp16", "Char": "int8", "Double": "fp64"}
+
+
+# a .jsonl trace, or a torch profiler trace (chrome trace JSON with "traceEvents")
+def load(path):
+    if path.endswith(".jsonl"):
+        return read_jsonl(path)
+    with open(path) as f:
+        data = json.load(f)
+    if isinstance(data, dict) and "traceEvents" in data:
+        return from_profiler(data)
+    sys.exit(path + " is neither a .jsonl trace nor a torch profiler trace")
+
+
+def read_jsonl(path):
+    calls = []
+    with open(path) as f:
+        for lineno, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            call = json.loads(line)
+            where = path + ":" + str(lineno)
+            if call.get("op") not in OPS:
+                sys.exit(where + " : unknown op " + str(call.get("op")) + " ; expected one of " + ",".join(OPS))
+            if call["op"] == "barrier":
+                call.setdefault("dtype", "fp32")
+                call.setdefault("count", 0)
+            if "dtype" not in call:
+                sys.exit(where + " : " + call["op"] + " call has no dtype ; expected one of " + ",".join(DTYPES))
+            if call["dtype"] not in DTYPES:
+                sys.exit(where + " : unsupported dtype " + str(call["dtype"]) + " ; expected one of " + ",".join(DTYPES))
+            calls.append(call)
+    return calls
+
+
+def write_jsonl(path, calls):
+    with open(path, "w") as f:
+        for call in calls:
+            f.write(json.dumps(call) + "\n")
+
+
+# the record_param_comms events on the host give the collective, element count, dtype, and group,
+# and the gaps between them ; the nccl kernels give the recorded times when there is one kernel
+# for every collective.  Calls with other ops or dtypes are skipped.
+def from_profiler(data):
+    events = [e for e in data["traceEvents"] if e.get("ph") == "X"]
+    comms = sorted([e for e in events if e.get("name") == "record_param_comms"], key=lambda e: e["ts"])
+    kernels = sorted([e for e in events if e.get("cat") == "kernel" and e.get("name", "").lower().startswith("nccl")], key=lambda e: e["ts"])
+
+    calls = []
+    skipped = 0
+    end = None
+    for k, e in enumerate(comms):
+        a = e.get("args", {})
+        op = PROFILER_OPS.get(a.get("Collective name"))
+        dtype = PROFILER_DTYPES.get(a.get("dtype"), None)
+        if op is None or (dtype is None and op != "barrier"):
+            skipped += 1
+            continue
+        call = {"op": op, "count": int(a.get("In msg nelems", 0)), "dtype": dtype if dtype is not None else "fp32",
+                "group_size": int(a.get("Group size", 0)), "gap_us": 0.0 if end is None else max(0.0, e["ts"] - end)}
+        if "Process Group Ranks" in a:
+            ranks = a["Process Group Ranks"]
+            call["ranks"] = ast.literal_eval(ranks) if isinstance(ranks, str) else ranks
+        if len(kernels) == len(comms):
+            call["time_us"] = float(kernels[k]["dur"])
+        calls.append(call)
+        end = e["ts"] + e.get("dur", 0.0)
+
+    if skipped > 0:
+        print("skipped ", skipped, " calls with unsupported ops or dtypes", file=sys.stderr)
+    return calls
+
+
+# the kind of topology group for every call : the "group" field if there is one, or else the kind
+# whose groups have the recorded size and, when the ranks were recorded, the same ranks
+def resolve_groups(calls, topo, kinds):
+    for call in calls:
+        if "group" in call:
+            if call["group"] != "world" and call["group"] not in kinds:
+                sys.exit("unknown group in trace : " + call["group"])
+            continue
+        size = call.get("group_size", 0)
+        if size in (0, topo.world_size):
+            call["group"] = "world"
+            continue
+        match = None
+        for kind in kinds:
+            if topo.size(kind) != size:
+                continue
+            if "ranks" in call:
+                index, ranks = topo.group_of(kind, call["ranks"][0])
+                if sorted(ranks.tolist()) != sorted(call["ranks"]):
+                    continue
+            match = kind
+            break
+        if match is None:
+            sys.exit("no group in the topology matches a traced group of size " + str(size) + " : check -t, -p, -x, -e, and --order")
+        call["group"] = match
+
+
+# (input elements, output elements) on each rank for a call on a group of gsize ranks
+def buffer_counts(call, gsize):
+    n = int(call.get("count", 0))
+    op = call["op"]
+    if op == "allgather":
+        return n, n*gsize
+    if op == "reduce_scatter":
+        return (n // gsize)*gsize, n // gsize
+    if op == "alltoall":
+        return (n // gsize)*gsize, (n // gsize)*gsize
+    return n, n
@@ -0,0 +1,99 @@
+#
+# Copyright IBM Corp. 2024
+# SPDX-License-Identifier: MIT
+#
+
+import sys
+import json
+import argparse
+import numpy as np
+from commbench import alphabeta
+
+# usage : python fit.py results.jsonl [more results files] --predict 0.5,64,1024 --group-sizes 64,256
+#   fits a piecewise alpha-beta model to the sweeps written with --results, one model for every
+#   collective, group, timer, dtype, and reduction op, and predicts times at other sizes and group sizes
+parser = argparse.ArgumentParser()
+parser.add_argument("paths", nargs="+")
+parser.add_argument("--timer", type=str, default=None)
+parser.add_argument("--stat", choices=["tavg", "tmin", "p50"], default="tavg")
+parser.add_argument("--max-breaks", type=int, default=2)
+parser.add_argument("--congestion", action="store_true")
+parser.add_argument("--predict", type=str, default=None)
+parser.add_argument("--group-sizes", type=str, default=None)
+parser.add_argument("--save", type=str, default=None)
+
+args = parser.parse_args()
+
+records = []
+for path in args.paths:
+    records.extend(alphabeta.load_records(path))
+
+# only the size sweeps of a single collective : per-group rows, concurrent jobs, overlap runs,
+# buckets, and skewed all-to-all splits measure something else
+OTHER_FIELDS = ("group_index", "concurrent_with", "overlap_efficiency", "method")
+stat = args.stat + "_usec"
+sweeps = [r for r in records if r.get("collective") in alphabeta.STEPS and r.get("timer") != "group"
+          and not any(r.get(key) not in (None, "") for key in OTHER_FIELDS) and r.get("splits", "uniform") in ("uniform", "")
+          and r.get(stat) not in (None, "") and r.get("bytes") not in (None, "")]
+
+# the device timer when there is one, since it leaves out the launch overhead on the host
+timers = sorted(set(r["timer"] for r in sweeps))
+timer = args.timer if args.timer is not None else ("device" if "device" in timers else "host")
+sweeps = [r for r in sweeps if r["timer"] == timer]
+if len(sweeps) == 0:
+    sys.exit("no sweep records with timer " + timer + " and " + stat + " in " + " ".join(args.paths) + " ; timers found : " + ",".join(timers))
+
+series = {}
+for r in sweeps:
+    key = (r["collective"], r.get("group", "world"), r.get("dtype", "fp32"), r.get("op", "sum") or "-")
+    series.setdefault(key, []).append(r)
+
+models = []
+for (collective, group, dtype_name, op_name), rows in sorted(series.items()):
+    n = np.array([float(r["bytes"]) for r in rows])
+    p = np.array([float(r["group_size"]) for r in rows])
+    t = 1.0e-6*np.array([float(r[stat]) for r in rows])
+    keep = (t > 0.0) & (n > 0.0) & (p > 1.0)
+    model = alphabeta.fit(collective, n[keep], p[keep], t[keep], args.max_breaks, args.congestion)
+    if model is None:
+        print("too few points to fit ", collective, " on ", group, " (", dtype_name, ", ", op_name, ")", file=sys.stderr)
+        continue
+    if args.congestion and not model["congestion"]:
+        print("no congestion term for ", collective, " on ", group, " (", dtype_name, ", ", op_name, ") : it needs at least three group sizes",
+              file=sys.stderr)
+    model.update({"group": group, "dtype": dtype_name, "op": op_name, "timer": timer, "stat": args.stat,
+                  "group_sizes": sorted(set(int(q) for q in p[keep])), "min_bytes": float(n[keep].min()), "max_bytes": float(n[keep].max()),
+                  "npts": int(keep.sum())})
+    models.append(model)
+
+for model in models:
+    print(model["collective"], " on ", model["group"], " (", model["dtype"], ", ", model["op"], ") : ", model["npts"], " points, group sizes ",
+          model["group_sizes"], ", rms relative error ", "{:.3f}".format(model["rms"]))
+    print("    from(MB)       to(MB)   const(usec)   alpha(usec)   busbw(GB/sec)   congestion(GB/sec)")
+    for row in alphabeta.describe(model):
+        to = "{:12.3f}".format(1.0e-6*row["to"]) if np.isfinite(row["to"]) else "         inf"
+        congestion = "{:20.2f}".format(1.0e-9/row["congestion"]) if row["congestion"] > 0.0 else "                   -"
+        print("{:12.3f}".format(1.0e-6*row["from"]), to, "{:13.2f}".format(1.0e6*row["constant"]), "{:13.2f}".format(1.0e6*row["alpha"]),
+              "{:15.2f}".format(1.0e-9*row["bandwidth"]), congestion)
+    print("")
+
+# predictions at the requested sizes and group sizes ; values outside the measured range are marked
+if args.predict is not None:
+    sizes_MB = [float(s) for s in args.predict.split(",") if s.strip()]
+    for model in models:
+        gsizes = [int(q) for q in args.group_sizes.split(",") if q.strip()] if args.group_sizes is not None else model["group_sizes"]
+        print("predicted ", model["collective"], " on ", model["group"], " (", model["dtype"], ", ", model["op"], ") in usec, * = extrapolated")
+        print("    size(MB)" + "".join("{:>14s}".format("p=" + str(q)) for q in gsizes))
+        for nMB in sizes_MB:
+            line = "{:12.3f}".format(nMB)
+            for q in gsizes:
+                t = alphabeta.predict(model, 1.0e6*nMB, q)[0]
+                outside = 1.0e6*nMB < model["min_bytes"] or 1.0e6*nMB > model["max_bytes"] or q not in model["group_sizes"]
+                line += "{:13.1f}".format(1.0e6*t) + ("*" if outside else " ")
+            print(line)
+        print("")
+
+if args.save is not None:
+    with open(args.save, "w") as f:
+        json.dump(models, f, indent=1)
+    print("wrote ", len(models), " models to ", args.save)
@@ -0,0 +1,214 @@
+#
+# Copyright IBM Corp. 2024
+# SPDX-License-Identifier: MIT
+#
+
+import sys
+import time
+import numpy as np
+import torch
+import torch.distributed as dist
+import argparse
+from commbench import backend, buffers, params, results, sampling, timing
+
+# one FSDP training step as a schedule over the units (layers) of a model : in the forward pass
+# the allgather for the next units is issued while the current unit computes, and in the backward
+# pass the units are gathered again in reverse order and their gradients are reduce-scattered.
+# The exposed communication time is the step time minus the time for the compute alone.
+parser = argparse.ArgumentParser()
+parser.add_argument("-m", "--multiplier", type=int, default=1)
+parser.add_argument("--prefetch", type=str, default="0,1,2")
+parser.add_argument("--compute-ms", type=float, default=1.0)
+parser.add_argument("--compute", choices=["sleep", "matmul"], default="sleep")
+parser.add_argument("--matmul", type=int, default=2048)
+params.add_param_args(parser)
+backend.add_backend_args(parser)
+sampling.add_sampling_args(parser)
+buffers.add_buffer_args(parser)
+buffers.add_dtype_args(parser)
+results.add_results_args(parser)
+
+args = parser.parse_args()
+depths = [int(d) for d in args.prefetch.split(",") if d.strip()]
+compute_ms = args.compute_ms
+
+comm = backend.init(args)
+
+rank = comm.rank
+world_size = comm.world_size
+device = comm.device
+use_events = comm.device_type == "cuda"
+
+# a step is finished when the last reduce-scatter is done, so time from the host
+timer = timing.Timer(comm, "host")
+sampler = sampling.Sampler(comm, args)
+dtypes = buffers.dtypes(args)
+
+if rank == 0:
+    print("backend : ", comm.name, " device : ", comm.device_type, " version : ", comm.version(), file=sys.stderr)
+
+units = params.unit_sizes(args)
+nunits = len(units)
+nslots = max(depths) + 1
+
+# shards are padded so that every unit divides evenly over the ranks
+nlocal = [int(-(-n // world_size)) for n in units]
+maxlocal = max(nlocal)
+
+# each slot holds one gathered unit and one unit of gradients ; prefetch depth d needs d + 1 slots
+pool = buffers.BufferPool(comm, args.fill)
+for dtype_name, dtype, esize in dtypes:
+    for slot in range(nslots):
+        pool.request(("full", slot), esize*maxlocal*world_size)
+        pool.request(("grad", slot), esize*maxlocal*world_size)
+    pool.request("shard", esize*maxlocal)
+    pool.request("grad_shard", esize*maxlocal)
+pool.allocate()
+
+###############################################################################################
+
+# simulated compute : a sleep kernel on the GPU (or a sleep on the host for the CPU), or a number
+# of matmuls, calibrated so that one call takes about the requested time
+if args.compute == "matmul":
+    A = buffers.allocate(args.matmul*args.matmul, device, "random").view(args.matmul, args.matmul)
+    C = buffers.allocate(args.matmul*args.matmul, device, "none").view(args.matmul, args.matmul)
+    for r in range(3):
+        torch.mm(A, A, out=C)
+    comm.synchronize()
+    t1 = time.perf_counter()
+    for r in range(10):
+        torch.mm(A, A, out=C)
+    comm.synchronize()
+    per_call = (time.perf_counter() - t1)/10.0
+    reps_per_ms = 1.0e-3/per_call
+elif use_events:
+    start = torch.cuda.Event(enable_timing=True)
+    stop = torch.cuda.Event(enable_timing=True)
+    torch.cuda._sleep(1000000)
+    start.record()
+    torch.cuda._sleep(10000000)
+    stop.record()
+    comm.synchronize()
+    cycles_per_ms = 10000000/start.elapsed_time(stop)
+
+def compute(ms):
+    if ms <= 0.0:
+        return
+    if args.compute == "matmul":
+        for r in range(max(1, int(round(ms*reps_per_ms)))):
+            torch.mm(A, A, out=C)
+    elif use_events:
+        torch.cuda._sleep(int(ms*cycles_per_ms))
+    else:
+        time.sleep(1.0e-3*ms)
+
+###############################################################################################
+
+writer = results.open_writer(args, comm, nunits=nunits, nparams=int(units.sum()), compute_ms=compute_ms, compute=args.compute)
+
+if rank == 0:
+    print(pool.report(), file=sys.stderr)
+    print("model : ", nunits, " units, ", "{:.1f}".format(1.0e-6*units.sum()), " M parameters, largest unit ",
+          "{:.1f}".format(1.0e-6*units.max()), " M ; compute ", compute_ms, " msec forward and ", 2.0*compute_ms,
+          " msec backward per unit (", args.compute, ")", file=sys.stderr)
+    print(" ", file=sys.stderr)
+    print(" prefetch   step(msec)  compute(msec)   comm(msec)  exposed(msec)   hidden(%)  dtype", file=sys.stderr)
+
+for dtype_name, dtype, esize in dtypes:
+
+    shard = pool.view("shard", maxlocal, dtype)
+    grad_shard = pool.view("grad_shard", maxlocal, dtype)
+    full = [pool.view(("full", slot), maxlocal*world_size, dtype) for slot in range(nslots)]
+    grad = [pool.view(("grad", slot), maxlocal*world_size, dtype) for slot in range(nslots)]
+
+    def schedule(depth, with_comm=True, with_compute=True):
+        slots = depth + 1
+        gathers = {}
+        scatters = {}
+
+        def gather(i):
+            if with_comm and 0 <= i < nunits and i not in gathers:
+                n = nlocal[i]
+                gathers[i] = dist.all_gather_into_tensor(full[i % slots][0:n*world_size], shard[0:n], async_op=True)
+
+        def wait_gather(i):
+            if i in gathers:
+                gathers.pop(i).wait()
+
+        # forward : unit i is needed now, and units i+1 .. i+depth are prefetched
+        for i in range(nunits):
+            for j in range(i, i + depth + 1):
+                gather(j)
+            wait_gather(i)
+            if with_compute:
+                compute(compute_ms)
+
+        # backward : the units are gathered again in reverse order, and the gradients of each unit
+        # are reduce-scattered as soon as its compute is done ; a gradient slot is reused only
+        # after its previous reduce-scatter has finished
+        for i in range(nunits - 1, -1, -1):
+            for j in range(i, i - depth - 1, -1):
+                gather(j)
+            wait_gather(i)
+            if with_compute:
+                compute(2.0*compute_ms)
+            if with_comm:
+                slot = i % slots
+                if slot in scatters:
+                    scatters.pop(slot).wait()
+                n = nlocal[i]
+                scatters[slot] = dist.reduce_scatter_tensor(grad_shard[0:n], grad[slot][0:n*world_size], async_op=True)
+
+        for work in scatters.values():
+            work.wait()
+
+    nMB = 1.0e-6*esize*units.sum()
+
+    # the compute alone does not depend on the prefetch depth
+    def compute_only(async_op):
+        schedule(0, with_comm=False)
+
+    t_compute_times = sampler.run(timer, compute_only, nMB)["host"]
+    t_compute = float(np.mean(t_compute_times))
+
+    record = {"collective": "fsdp_step", "size_MB": nMB, "bytes": int(esize*units.sum()), "group": "world", "group_size": world_size,
+              "timer": "compute", "dtype": dtype_name}
+    record.update(results.timing_record(t_compute_times, 0.0))
+    for key in ("avgbw_GBs", "maxbw_GBs", "minbw_GBs"):
+        del record[key]
+    writer.write(record)
+
+    for depth in depths:
+
+        def step(async_op, depth=depth):
+            schedule(depth)
+
+        def comm_only(async_op, depth=depth):
+            schedule(depth, with_compute=False)
+
+        # two warmup calls are made outside the timing loop
+        step_times = sampler.run(timer, step, nMB)["host"]
+        comm_times = sampler.run(timer, comm_only, nMB)["host"]
+
+        t_step = float(np.mean(step_times))
+        t_comm = float(np.mean(comm_times))
+        exposed = max(0.0, t_step - t_compute)
+        hidden = 100.0*max(0.0, 1.0 - exposed/t_comm)
+
+        if rank == 0:
+            print("{:9d}".format(depth), "{:12.3f}".format(1.0e3*t_step), "{:14.3f}".format(1.0e3*t_compute), "{:12.3f}".format(1.0e3*t_comm),
+                  "{:14.3f}".format(1.0e3*exposed), "{:11.1f}".format(hidden), "  ", "{:>5s}".format(dtype_name), file=sys.stderr)
+
+        for name, times in (("step", step_times), ("comm", comm_times)):
+            record = {"collective": "fsdp_step", "size_MB": nMB, "bytes": int(esize*units.sum()), "group": "world", "group_size": world_size,
+                      "timer": name, "dtype": dtype_name, "prefetch": depth}
+            if name == "step":
+                record["exposed_usec"] = 1.0e6*exposed
+            record.update(results.timing_record(times, 0.0))
+            for key in ("avgbw_GBs", "maxbw_GBs", "minbw_GBs"):
+                del record[key]
+            writer.write(record)
+
+writer.close()
+
+comm.destroy()
@@ -0,0 +1,212 @@
+#
+# Copyright IBM Corp. 2024
+# SPDX-License-Identifier: MIT
+#
+
+import sys
+import itertools
+import torch
+import torch.distributed as dist
+import argparse
+from commbench import backend, buffers, grouptimes, pgroups, results, sampling, sizes, splits, timing, topology
+
+# all_to_all_single within the expert-parallel groups (or any other kind of group with -c) ; the
+# size is the number of bytes that each rank sends, and with --splits zipf the destinations are
+# skewed as in mixture-of-experts token routing
+parser = argparse.ArgumentParser()
+parser.add_argument("-c", "--communicator", choices=["expert", "data", "model", "pipeline", "tensor", "context"], default="expert")
+parser.add_argument("-m", "--multiplier", type=int, default=1)
+topology.add_topology_args(parser)
+pgroups.add_group_args(parser)
+backend.add_backend_args(parser)
+timing.add_timing_args(parser)
+sampling.add_sampling_args(parser)
+sizes.add_size_args(parser)
+buffers.add_buffer_args(parser)
+buffers.add_dtype_args(parser)
+splits.add_split_args(parser)
+results.add_results_args(parser)
+
+args = parser.parse_args()
+tp_size = args.tensor_parallel
+pp_size = args.pipeline_parallel
+cp_size = args.context_parallel
+ep_size = args.expert_parallel
+communicator = args.communicator
+order = args.order
+
+comm = backend.init(args)
+
+world_rank = comm.rank
+world_size = comm.world_size
+local_size = comm.local_size
+device = comm.device
+
+timer = timing.Timer(comm, args.timer)
+sampler = sampling.Sampler(comm, args)
+sweep = sizes.sweep(args)
+dtypes = buffers.dtypes(args)
+distributions = splits.distributions(args)
+
+if world_rank == 0:
+    print("backend : ", comm.name, " device : ", comm.device_type, " version : ", comm.version(), file=sys.stderr)
+
+# the rank grid, with every kind of group derived from it by transpose and reshape
+topo = topology.Topology(world_size, tp_size, pp_size, cp_size, ep_size, order)
+
+dp_size = topo.dp_size
+mp_size = topo.size("model")
+
+mynode = world_rank // local_size
+
+if world_rank == 0:
+    topo.describe(["tensor", "context", "expert", "data", "pipeline", "model"], args.print_groups, file=sys.stderr)
+
+# only the groups for the selected communicator are created, and only when first needed
+groups = pgroups.ProcessGroups(comm, topo, args.group_init)
+
+mygroup, myranks = groups.get(communicator)
+group_size = topo.size(communicator)
+group_ranks = topo.groups(communicator)
+
+if world_rank == 0:
+    print("using communicator = ", communicator, "; order =", order, "; group size = ", group_size, file=sys.stderr)
+    print(" ", file=sys.stderr)
+
+group_rank = dist.get_rank(group=mygroup)
+
+# the per-group times are gathered to rank 0 after the sweep and written to one table per dtype and distribution
+group_times = {(dtype_name, distribution): grouptimes.GroupTimes(sweep) for (dtype_name, dtype, esize), distribution in itertools.product(dtypes, distributions)}
+
+###############################################################################################
+
+# the split matrix within a group for every size, dtype, and distribution ; every group uses the
+# same matrix, and the pool is sized for the busiest receiver
+matrices = {}
+pool = buffers.BufferPool(comm, args.fill)
+for nMB in sweep:
+    for (dtype_name, dtype, esize), distribution in itertools.product(dtypes, distributions):
+        matrix = splits.split_matrix(group_size, int(nMB*1.0e6/esize), distribution, args.zipf_alpha, args.seed)
+        matrices[(nMB, dtype_name, distribution)] = matrix
+        pool.request("input", esize*int(matrix.sum(axis=1).max()))
+        pool.request("output", esize*int(matrix.sum(axis=0).max()))
+pool.allocate()
+
+if world_rank == 0:
+    print(pool.report(), file=sys.stderr)
+    print(" ", file=sys.stderr)
+
+group_is_in_node = 0
+if group_rank == 0:
+    if mynode == 0:
+        group_is_in_node = 1
+
+NodeTensor  = torch.tensor([[group_is_in_node]], dtype=torch.int, device=device)
+dist.all_reduce(NodeTensor, op=dist.ReduceOp.SUM, group=None)
+comm.synchronize()
+
+NodeTensor = NodeTensor.cpu()
+
+groups_per_node = int(NodeTensor[0])
+
+if world_rank == 0:
+    print("groups_per_node = ", groups_per_node, file=sys.stderr)
+    print(" ", file=sys.stderr)
+
+
+writer = results.open_writer(args, comm, tp_size=tp_size, pp_size=pp_size, cp_size=cp_size, ep_size=ep_size, dp_size=dp_size, order=order,
+                             communicator=communicator, groups_per_node=groups_per_node,
+                             zipf_alpha=args.zipf_alpha, seed=args.seed)
+
+# the first collective on a group sets up its communicator, so time it apart from the sweep
+groups.first_call(communicator)
+groups.report(file=sys.stderr)
+
+if world_rank == 0:
+    print(" size(MB)   tavg(usec)    tmin(usec)    tmax(usec)  avgbw(GB/sec)  maxbw(GB/sec)  minbw(GB/sec)   timer  dtype    splits  imbalance     cost", file=sys.stderr)
+
+for k, nMB in enumerate(sweep):
+
+    dist.barrier(group=None)
+
+    # sizes are in bytes, so the element count depends on the dtype
+    for dtype_name, dtype, esize in dtypes:
+
+        uniform_time = {}
+
+        for distribution in distributions:
+
+            matrix = matrices[(nMB, dtype_name, distribution)]
+            input_splits = matrix[group_rank].tolist()
+            output_splits = matrix[:, group_rank].tolist()
+
+            Input  = pool.view("input",  sum(input_splits),  dtype)
+            Output = pool.view("output", sum(output_splits), dtype)
+
+            # the splits are given explicitly for the uniform case too, so that both take the same code path
+            def collective(async_op):
+                return dist.all_to_all_single(Output, Input, output_splits, input_splits, group=mygroup, async_op=async_op)
+
+            def barrier():
+                dist.barrier(group=None)
+
+            # two warmup calls are made outside the timing loop
+            times = sampler.run(timer, collective, nMB, barrier=barrier)
+
+            group_times[(dtype_name, distribution)].record(k, times["group"])
+
+            # the device timer brackets only the collective for this rank, so take the slowest rank
+            if "device" in times:
+                times["device"] = timing.slowest(times["device"], comm)
+
+            factor = groups_per_node
+
+            nsend = int(matrix[group_rank].sum())
+            nbytes = factor*esize*1.0e-9*nsend*((group_size - 1)/group_size)
+            skew = splits.imbalance(matrix)
+
+            for name in timer.timers():
+                tavg, tmin, tmax = timing.summarize(times[name])
+
+                avgbw = nbytes/tavg
+                maxbw = nbytes/tmin
+                minbw = nbytes/tmax
+
+                if distribution == "uniform":
+                    uniform_time[name] = tavg
+                cost = tavg/uniform_time[name] if name in uniform_time else float("nan")
+
+                if world_rank == 0:
+                    print("{:8.2f}".format(nMB), "  ", "{:7.1f}".format(tavg*1.0e6), "      ", "{:7.1f}".format(tmin*1.0e6), "      ", "{:7.1f}".format(tmax*1.0e6), \
+                          "     ", "{:7.2f}".format(avgbw), "      ", "{:7.2f}".format(maxbw), "      ", "{:7.2f}".format(minbw), "  ", "{:>6s}".format(name), \
+                          "{:>6s}".format(dtype_name), "{:>9s}".format(distribution), "{:10.3f}".format(skew), "{:8.3f}".format(cost), file=sys.stderr)
+
+                record = {"collective": "alltoall", "size_MB": nMB, "bytes": esize*nsend, "group": communicator, "group_size": group_size, "timer": name,
+                          "dtype": dtype_name, "splits": distribution, "imbalance": skew}
+                if name in uniform_time:
+                    record["imbalance_cost"] = cost
+                record.update(results.timing_record(times[name], nbytes))
+                writer.write(record)
+
+# one gather of the group times, and one consolidated table on rank 0 that ranks the groups
+# by their slowdown relative to the median group, for every dtype and distribution
+for (dtype_name, dtype, esize), distribution in itertools.product(dtypes, distributions):
+    gathered = group_times[(dtype_name, distribution)].gather(comm)
+
+    if world_rank == 0:
+        table = grouptimes.slowdown_table(gathered, group_ranks)
+        filename = "group_times." + communicator + "." + order + ("." + dtype_name if len(dtypes) > 1 else "") + \
+                   ("." + distribution if len(distributions) > 1 else "") + ".txt"
+        grouptimes.write_table(filename, table, sweep, "# megatron-alltoall.py : communicator = " + communicator + " ; order = " + order + " ; dtype = " + dtype_name + " ; splits = " + distribution)
+        print("wrote the times for ", len(table), " groups to ", filename, file=sys.stderr)
+
+        for row in table:
+            for k, nMB in enumerate(sweep):
+                record = {"collective": "alltoall", "size_MB": nMB, "group": communicator, "group_size": group_size, "timer": "group", "dtype": dtype_name, "splits": distribution,
+                          "group_index": row["group"], "leader": row["leader"], "tavg_usec": 1.0e6*row["tavg"][k],
+                          "tmin_usec": 1.0e6*row["tmin"][k], "tmax_usec": 1.0e6*row["tmax"][k], "mean_slowdown": row["mean_slowdown"]}
+                writer.write(record)
+
+writer.close()
+
+comm.destroy()
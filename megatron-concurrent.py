@@ -0,0 +1,247 @@
+#
+# Copyright IBM Corp. 2024
+# SPDX-License-Identifier: MIT
+#
+
+import sys
+import threading
+import time
+import numpy as np
+import torch
+import torch.distributed as dist
+import argparse
+from commbench import backend, buffers, pgroups, results, timing, topology
+
+# usage : python megatron-concurrent.py -t 4 --jobs data:allreduce:100,tensor:allgather:8
+#   every --jobs option is one configuration of collectives, communicator:collective:size(MB),
+#   that run at the same time ; each one is also timed alone to get the slowdown from contention
+parser = argparse.ArgumentParser()
+parser.add_argument("-j", "--jobs", type=str, action="append", default=None)
+parser.add_argument("-n", "--iterations", type=int, default=100)
+parser.add_argument("--mode", choices=["streams", "threads"], default="streams")
+topology.add_topology_args(parser)
+pgroups.add_group_args(parser)
+backend.add_backend_args(parser)
+buffers.add_buffer_args(parser)
+buffers.add_dtype_args(parser)
+results.add_results_args(parser)
+
+args = parser.parse_args()
+niter = args.iterations
+mode = args.mode
+
+if args.jobs is None:
+    args.jobs = ["data:allreduce:100,tensor:allgather:8"]
+
+COLLECTIVES = ["allreduce", "allgather", "reduce_scatter"]
+
+# each configuration is a list of (communicator, collective, size in MB)
+configs = []
+for spec in args.jobs:
+    config = []
+    for item in spec.split(","):
+        fields = item.strip().split(":")
+        if len(fields) != 3 or fields[0] not in topology.KINDS or fields[1] not in COLLECTIVES:
+            sys.exit("bad job " + item + " : expected communicator:collective:size with a communicator in " +
+                     str(list(topology.KINDS)) + " and a collective in " + str(COLLECTIVES))
+        config.append((fields[0], fields[1], float(fields[2])))
+    configs.append(config)
+
+comm = backend.init(args)
+
+world_rank = comm.rank
+world_size = comm.world_size
+device = comm.device
+use_streams = comm.device_type == "cuda"
+dtypes = buffers.dtypes(args)
+
+if world_rank == 0:
+    print("backend : ", comm.name, " device : ", comm.device_type, " version : ", comm.version(), file=sys.stderr)
+
+topo = topology.Topology(world_size, args.tensor_parallel, args.pipeline_parallel, args.context_parallel, args.expert_parallel, args.order)
+
+kinds = sorted(set(job[0] for config in configs for job in config))
+
+if world_rank == 0:
+    topo.describe(kinds, args.print_groups, file=sys.stderr)
+
+groups = pgroups.ProcessGroups(comm, topo, args.group_init)
+for kind in kinds:
+    groups.get(kind)
+
+
+class Job:
+    # one collective on one communicator, with its own buffers and, on the GPU, its own stream
+
+    def __init__(self, index, kind, collective, nMB, dtype_name, dtype, esize):
+        self.index = index
+        self.kind = kind
+        self.collective = collective
+        self.nMB = nMB
+        self.dtype_name = dtype_name
+        self.dtype = dtype
+        self.esize = esize
+        self.group = groups.get(kind)[0]
+        self.group_size = topo.size(kind)
+        self.stream = torch.cuda.Stream() if use_streams else None
+
+        nglobal = int(nMB*1.0e6/esize)
+        nlocal = int((nglobal + 1)/self.group_size)
+        if collective == "allreduce":
+            self.nglobal = nglobal
+            self.sizes = {"input": nglobal}
+            factor = 2.0
+        elif collective == "allgather":
+            self.nglobal = nlocal*self.group_size
+            self.sizes = {"input": nlocal, "output": self.nglobal}
+            factor = 1.0
+        else:
+            self.nglobal = nlocal*self.group_size
+            self.sizes = {"input": self.nglobal, "output": nlocal}
+            factor = 1.0
+        self.nbytes = factor*esize*1.0e-9*self.nglobal*((self.group_size - 1)/self.group_size)
+
+    def name(self):
+        return self.kind + ":" + self.collective + ":" + str(self.nMB)
+
+    def request(self, pool):
+        for role, n in self.sizes.items():
+            pool.request((role, self.index), self.esize*n)
+
+    def bind(self, pool):
+        self.input = pool.view(("input", self.index), self.sizes["input"], self.dtype)
+        if "output" in self.sizes:
+            self.output = pool.view(("output", self.index), self.sizes["output"], self.dtype)
+
+    def launch(self, async_op):
+        if self.collective == "allreduce":
+            return dist.all_reduce(self.input, group=self.group, async_op=async_op)
+        if self.collective == "allgather":
+            return dist.all_gather_into_tensor(self.output, self.input, group=self.group, async_op=async_op)
+        return dist.reduce_scatter_tensor(self.output, self.input, group=self.group, async_op=async_op)
+
+
+# all active jobs are launched together in every iteration : on the GPU each job goes to its own
+# stream, bracketed by cuda events on that stream, and on the CPU every job is an async work handle
+def run_streams(active, niter):
+    times = {job.index: np.empty(niter, dtype=np.float64) for job in active}
+    if use_streams:
+        starts = {job.index: [torch.cuda.Event(enable_timing=True) for i in range(niter)] for job in active}
+        stops = {job.index: [torch.cuda.Event(enable_timing=True) for i in range(niter)] for job in active}
+        for i in range(niter):
+            for job in active:
+                with torch.cuda.stream(job.stream):
+                    starts[job.index][i].record()
+                    job.launch(False)
+                    stops[job.index][i].record()
+        comm.synchronize()
+        for job in active:
+            for i in range(niter):
+                times[job.index][i] = 1.0e-3*starts[job.index][i].elapsed_time(stops[job.index][i])
+    else:
+        for i in range(niter):
+            t1 = time.perf_counter()
+            works = [(job, job.launch(True)) for job in active]
+            for job, work in works:
+                times[job.index][i] = timing.completion_time(work) - t1
+    return times
+
+
+# every active job runs its own loop of blocking calls in a worker thread
+def run_threads(active, niter):
+    times = {job.index: np.empty(niter, dtype=np.float64) for job in active}
+
+    def worker(job):
+        if use_streams:
+            torch.cuda.set_device(device)
+            with torch.cuda.stream(job.stream):
+                for i in range(niter):
+                    t1 = time.perf_counter()
+                    job.launch(False)
+                    job.stream.synchronize()
+                    times[job.index][i] = time.perf_counter() - t1
+        else:
+            for i in range(niter):
+                t1 = time.perf_counter()
+                job.launch(False)
+                times[job.index][i] = time.perf_counter() - t1
+
+    threads = [threading.Thread(target=worker, args=(job,)) for job in active]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return times
+
+
+run = run_streams if mode == "streams" else run_threads
+
+# one pool for the buffers of every job in every configuration and dtype ; the configurations
+# are run once for every dtype, with all of their jobs in that dtype
+jobs = [[Job(j, *job, *dtype) for j, job in enumerate(config)] for dtype in dtypes for config in configs]
+
+pool = buffers.BufferPool(comm, args.fill)
+for config in jobs:
+    for job in config:
+        job.request(pool)
+pool.allocate()
+
+if world_rank == 0:
+    print(pool.report(), file=sys.stderr)
+    print(" ", file=sys.stderr)
+
+writer = results.open_writer(args, comm, tp_size=args.tensor_parallel, pp_size=args.pipeline_parallel, cp_size=args.context_parallel,
+                             ep_size=args.expert_parallel, dp_size=topo.dp_size, order=args.order, mode=mode)
+
+for c, config in enumerate(jobs):
+
+    for job in config:
+        job.bind(pool)
+
+    # warmup, which also sets up the communicators
+    for job in config:
+        run([job], 2)
+    comm.synchronize()
+
+    # each job alone, then all of them at the same time ; the time for each iteration is the
+    # slowest over all ranks
+    alone = {}
+    for job in config:
+        dist.barrier()
+        alone[job.index] = timing.slowest(run([job], niter)[job.index], comm)
+
+    dist.barrier()
+    together = run(config, niter)
+    for job in config:
+        together[job.index] = timing.slowest(together[job.index], comm)
+
+    if world_rank == 0:
+        print("configuration ", c % len(configs), " : ", ", ".join(job.name() for job in config), " ; mode = ", mode, " ; dtype = ", config[0].dtype_name,
+              file=sys.stderr)
+        print(" job  communicator  collective        size(MB)  group   alone(usec)  together(usec)  slowdown  alone(GB/sec)  together(GB/sec)", file=sys.stderr)
+
+    for job in config:
+        t_alone = float(np.mean(alone[job.index]))
+        t_together = float(np.mean(together[job.index]))
+        slowdown = t_together/t_alone
+        others = ",".join(other.name() for other in config if other is not job)
+
+        if world_rank == 0:
+            print("{:4d}".format(job.index), "  ", "{:12s}".format(job.kind), "{:15s}".format(job.collective), "{:10.2f}".format(job.nMB),
+                  "{:6d}".format(job.group_size), "{:13.1f}".format(1.0e6*t_alone), "{:15.1f}".format(1.0e6*t_together),
+                  "{:9.3f}".format(slowdown), "{:14.2f}".format(job.nbytes/t_alone), "{:17.2f}".format(job.nbytes/t_together), file=sys.stderr)
+
+        for name, times in (("alone", alone[job.index]), ("together", together[job.index])):
+            record = {"collective": job.collective, "size_MB": job.nMB, "bytes": job.esize*job.nglobal, "group": job.kind,
+                      "group_size": job.group_size, "timer": name, "dtype": job.dtype_name, "concurrent_with": others}
+            record.update(results.timing_record(times, job.nbytes))
+            if name == "together":
+                record["slowdown"] = slowdown
+            writer.write(record)
+
+    if world_rank == 0:
+        print(" ", file=sys.stderr)
+
+writer.close()
+
+comm.destroy()
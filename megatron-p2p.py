@@ -0,0 +1,219 @@
+#
+# Copyright IBM Corp. 2024
+# SPDX-License-Identifier: MIT
+#
+
+import sys
+import numpy as np
+import torch
+import torch.distributed as dist
+import argparse
+from commbench import backend, buffers, results, sampling, sizes, timing, topology
+
+# point-to-point traffic between neighbouring pipeline stages, in every pipeline-parallel group at
+# the same time : "1f1b" is the steady state of the 1F1B schedule, where every stage sends an
+# activation forward and a gradient back while it receives both from its neighbours, and each
+# stage boundary is then timed on its own to give per-link latency and bandwidth
+parser = argparse.ArgumentParser()
+parser.add_argument("-m", "--multiplier", type=int, default=1)
+topology.add_topology_args(parser)
+backend.add_backend_args(parser)
+timing.add_timing_args(parser)
+sampling.add_sampling_args(parser)
+sizes.add_size_args(parser)
+buffers.add_buffer_args(parser)
+buffers.add_dtype_args(parser)
+results.add_results_args(parser)
+
+args = parser.parse_args()
+tp_size = args.tensor_parallel
+pp_size = args.pipeline_parallel
+cp_size = args.context_parallel
+ep_size = args.expert_parallel
+order = args.order
+
+# activations are the messages between stages
+sizes.use_activation_grid(args)
+
+comm = backend.init(args)
+
+world_rank = comm.rank
+world_size = comm.world_size
+local_size = comm.local_size
+device = comm.device
+
+# the device timer needs a work handle on the CPU, and batch_isend_irecv returns a list of them
+if comm.device_type == "cpu" and args.timer != "host":
+    args.timer = "host"
+    if world_rank == 0:
+        print("using the host timer for point-to-point on the cpu", file=sys.stderr)
+
+timer = timing.Timer(comm, args.timer)
+sampler = sampling.Sampler(comm, args)
+sweep = sizes.sweep(args)
+dtypes = buffers.dtypes(args)
+
+if world_rank == 0:
+    print("backend : ", comm.name, " device : ", comm.device_type, " version : ", comm.version(), file=sys.stderr)
+
+topo = topology.Topology(world_size, tp_size, pp_size, cp_size, ep_size, order)
+
+if pp_size < 2:
+    sys.exit("the point-to-point benchmark needs at least two pipeline stages : use -p")
+
+if world_rank == 0:
+    topo.describe(["pipeline"], args.print_groups, file=sys.stderr)
+
+# every link joins stage b and stage b+1 of one pipeline group
+pp_groups = topo.groups("pipeline")
+nboundaries = pp_size - 1
+myranks = topo.group_of("pipeline", world_rank)[1]
+stage = int(np.nonzero(myranks == world_rank)[0][0])
+prev_rank = int(myranks[stage - 1]) if stage > 0 else None
+next_rank = int(myranks[stage + 1]) if stage < pp_size - 1 else None
+
+nodes = pp_groups // local_size
+cross_node = nodes[:, :-1] != nodes[:, 1:]
+
+pool = buffers.BufferPool(comm, args.fill)
+for nMB in sweep:
+    for dtype_name, dtype, esize in dtypes:
+        for role in ("send_next", "recv_next", "send_prev", "recv_prev"):
+            pool.request(role, esize*int(nMB*1.0e6/esize))
+pool.allocate()
+
+if world_rank == 0:
+    print(pool.report(), file=sys.stderr)
+    print(" ", file=sys.stderr)
+
+writer = results.open_writer(args, comm, tp_size=tp_size, pp_size=pp_size, cp_size=cp_size, ep_size=ep_size, dp_size=topo.dp_size, order=order)
+
+# the mean time for every dtype, boundary, and size, for this rank's own exchanges ; gathered after the sweep
+link_times = np.zeros((len(dtypes), nboundaries, len(sweep)), dtype=np.float64)
+
+if world_rank == 0:
+    print(" size(KB)    p50(usec)    p99(usec)   tavg(usec)   tmin(usec)   tmax(usec)  bw(GB/sec)   timer   boundary  dtype", file=sys.stderr)
+
+for k, nMB in enumerate(sweep):
+
+    # sizes are in bytes, so the element count depends on the dtype
+    for d, (dtype_name, dtype, esize) in enumerate(dtypes):
+        npts = int(nMB*1.0e6/esize)
+
+        SendNext = pool.view("send_next", npts, dtype)
+        RecvNext = pool.view("recv_next", npts, dtype)
+        SendPrev = pool.view("send_prev", npts, dtype)
+        RecvPrev = pool.view("recv_prev", npts, dtype)
+
+        # the exchange with the next stage sends an activation and receives a gradient, and the
+        # exchange with the previous stage receives an activation and sends a gradient
+        def exchange(with_prev, with_next):
+            ops = []
+            if with_next and next_rank is not None:
+                ops.append(dist.P2POp(dist.isend, SendNext, next_rank))
+                ops.append(dist.P2POp(dist.irecv, RecvNext, next_rank))
+            if with_prev and prev_rank is not None:
+                ops.append(dist.P2POp(dist.irecv, RecvPrev, prev_rank))
+                ops.append(dist.P2POp(dist.isend, SendPrev, prev_rank))
+            if len(ops) > 0:
+                for req in dist.batch_isend_irecv(ops):
+                    req.wait()
+
+        def barrier():
+            dist.barrier(group=None)
+
+        runs = [("1f1b", None)] + [("link", b) for b in range(nboundaries)]
+
+        for kind, b in runs:
+
+            if kind == "1f1b":
+                def step(async_op):
+                    exchange(True, True)
+            else:
+                # only the two stages on either side of boundary b take part, in every pipeline group
+                def step(async_op):
+                    exchange(stage == b + 1, stage == b)
+
+            dist.barrier(group=None)
+
+            # two warmup calls are made outside the timing loop
+            times = sampler.run(timer, step, nMB, barrier=barrier)
+
+            if kind == "link" and stage in (b, b + 1):
+                link_times[d, b, k] = float(np.mean(times["group"]))
+
+            # every pipeline group runs at the same time, so take the slowest rank
+            if "device" in times:
+                times["device"] = timing.slowest(times["device"], comm)
+
+            # bytes sent in each direction across one link
+            nbytes = esize*1.0e-9*npts
+
+            for name in timer.timers():
+                tavg, tmin, tmax = timing.summarize(times[name])
+                p50, p99 = timing.percentiles(times[name])
+                label = "all" if kind == "1f1b" else str(b) + "-" + str(b + 1)
+
+                if world_rank == 0:
+                    print("{:9.1f}".format(1.0e3*nMB), "  ", "{:9.1f}".format(p50*1.0e6), "  ", "{:9.1f}".format(p99*1.0e6), "  ", "{:9.1f}".format(tavg*1.0e6), \
+                          "  ", "{:9.1f}".format(tmin*1.0e6), "  ", "{:9.1f}".format(tmax*1.0e6), "  ", "{:9.2f}".format(nbytes/tavg), "  ", "{:>6s}".format(name), \
+                          "{:>10s}".format(label), "  ", "{:>5s}".format(dtype_name), file=sys.stderr)
+
+                record = {"collective": "sendrecv_" + kind, "size_MB": nMB, "bytes": esize*npts, "group": "pipeline", "group_size": pp_size, "timer": name,
+                          "dtype": dtype_name}
+                if kind == "link":
+                    record["stage"] = b
+                record.update(results.timing_record(times[name], nbytes))
+                writer.write(record)
+
+# one gather of the link times ; a link takes as long as the slower of its two ends, and links
+# are ranked by their mean time relative to the median link
+local = torch.from_numpy(link_times.reshape(-1)).to(device)
+everything = torch.empty(world_size*local.numel(), dtype=torch.float64, device=device)
+dist.all_gather_into_tensor(everything, local)
+comm.synchronize()
+
+if world_rank == 0:
+    gathered = everything.cpu().numpy().reshape(world_size, len(dtypes), nboundaries, len(sweep))
+    ngroups = pp_groups.shape[0]
+
+    for d, (dtype_name, dtype, esize) in enumerate(dtypes):
+        links = np.empty((ngroups, nboundaries, len(sweep)), dtype=np.float64)
+        for b in range(nboundaries):
+            links[:, b, :] = np.maximum(gathered[pp_groups[:, b], d, b, :], gathered[pp_groups[:, b + 1], d, b, :])
+
+        slowdown = (links/np.median(links.reshape(-1, len(sweep)), axis=0)).mean(axis=2)
+        ranked = np.dstack(np.unravel_index(np.argsort(slowdown, axis=None)[::-1], slowdown.shape))[0]
+        nbytes = [esize*int(nMB*1.0e6/esize) for nMB in sweep]
+
+        filename = "p2p_links." + order + ("." + dtype_name if len(dtypes) > 1 else "") + ".txt"
+        with open(filename, "w") as f:
+            print("# megatron-p2p.py : order = " + order + " ; tp = " + str(tp_size) + " ; pp = " + str(pp_size) + " ; dtype = " + dtype_name, file=f)
+            print("# links ranked by mean slowdown relative to the median link ; times in usec", file=f)
+            print("# group  boundary   rank_a   rank_b  cross_node  mean_slowdown", file=f)
+            for g, b in ranked:
+                print("{:7d}".format(g), "{:9d}".format(b), "{:8d}".format(pp_groups[g, b]), "{:8d}".format(pp_groups[g, b + 1]),
+                      "{:11d}".format(int(cross_node[g, b])), "{:14.3f}".format(slowdown[g, b]), file=f)
+            print("", file=f)
+            print("# per-size times for each link : size(MB)  time(usec)  bw(GB/sec)", file=f)
+            for g, b in ranked:
+                print("# group ", g, " boundary ", b, " ranks ", pp_groups[g, b], "-", pp_groups[g, b + 1], file=f)
+                for k in range(len(sweep)):
+                    print("{:8.3f}".format(sweep[k]), "{:12.1f}".format(1.0e6*links[g, b, k]), "{:12.2f}".format(1.0e-9*nbytes[k]/links[g, b, k]), file=f)
+
+        print(" ", file=sys.stderr)
+        print("slowest links for ", dtype_name, " : group, boundary, ranks, cross node, mean slowdown ; all links are in ", filename, file=sys.stderr)
+        for g, b in ranked[0:8]:
+            print("{:7d}".format(g), "{:9d}".format(b), "{:8d}".format(pp_groups[g, b]), "{:8d}".format(pp_groups[g, b + 1]),
+                  "{:7s}".format("yes" if cross_node[g, b] else "no"), "{:10.3f}".format(slowdown[g, b]), file=sys.stderr)
+
+        for g, b in ranked:
+            for k, nMB in enumerate(sweep):
+                record = {"collective": "sendrecv_link", "size_MB": nMB, "bytes": nbytes[k], "dtype": dtype_name, "group": "pipeline", "group_size": pp_size,
+                          "timer": "group", "group_index": int(g), "stage": int(b), "link": str(pp_groups[g, b]) + "-" + str(pp_groups[g, b + 1]),
+                          "cross_node": bool(cross_node[g, b]), "tavg_usec": 1.0e6*links[g, b, k], "mean_slowdown": float(slowdown[g, b])}
+                writer.write(record)
+
+writer.close()
+
+comm.destroy()
@@ -3,152 +3,74 @@
 # SPDX-License-Identifier: MIT
 #
 
-import os
 import sys
+import itertools
 import torch
 import torch.distributed as dist
-import time
 import argparse
+from commbench import backend, buffers, grouptimes, pgroups, reduceops, results, sampling, sizes, timing, topology
 
 parser = argparse.ArgumentParser()
-parser.add_argument("-t", "--tensor_parallel", type=int, default=1)
-parser.add_argument("-p", "--pipeline_parallel", type=int, default=1)
-parser.add_argument("-c", "--communicator", choices=["data", "model", "pipeline"], default="data")
+parser.add_argument("-c", "--communicator", choices=["data", "model", "pipeline", "tensor", "context"], default="data")
 parser.add_argument("-m", "--multiplier", type=int, default=1)
-parser.add_argument("-o", "--order", choices=["tdp", "tpd"], default="tdp")
+topology.add_topology_args(parser)
+pgroups.add_group_args(parser)
+backend.add_backend_args(parser)
+timing.add_timing_args(parser)
+sampling.add_sampling_args(parser)
+sizes.add_size_args(parser)
+buffers.add_buffer_args(parser)
+buffers.add_dtype_args(parser)
+reduceops.add_op_args(parser)
+results.add_results_args(parser)
 
 args = parser.parse_args()
 tp_size = args.tensor_parallel
 pp_size = args.pipeline_parallel
+cp_size = args.context_parallel
+ep_size = args.expert_parallel
 communicator = args.communicator
-multiplier = args.multiplier
 order = args.order
 
-local_rank = int(os.environ["LOCAL_RANK"])
-world_rank = int(os.environ["RANK"])
-world_size = int(os.environ["WORLD_SIZE"])
+# tensor- and context-parallel traffic is small, frequent, and latency bound, so those groups
+# default to activation-sized messages and report the median and tail latency
+latency = communicator in ("tensor", "context")
+if latency:
+    sizes.use_activation_grid(args)
 
-local_size = torch.cuda.device_count()
+comm = backend.init(args)
 
-torch.cuda.set_device(local_rank)
+world_rank = comm.rank
+world_size = comm.world_size
+local_size = comm.local_size
+device = comm.device
 
-dist.init_process_group("nccl")
+timer = timing.Timer(comm, args.timer)
+sampler = sampling.Sampler(comm, args)
+sweep = sizes.sweep(args)
+dtypes = buffers.dtypes(args)
 
 if world_rank == 0:
-    print("NCCL version : ", torch.cuda.nccl.version(), file=sys.stderr)
+    print("backend : ", comm.name, " device : ", comm.device_type, " version : ", comm.version(), file=sys.stderr)
 
-_PIPELINE_MODEL_PARALLEL_GROUP = None
-_MODEL_PARALLEL_GROUP = None
-_DATA_PARALLEL_GROUP = None
+# the rank grid, with every kind of group derived from it by transpose and reshape
+topo = topology.Topology(world_size, tp_size, pp_size, cp_size, ep_size, order)
 
-dp_size = world_size // (tp_size*pp_size)
-mp_size = tp_size * pp_size
-
-if world_rank == 0:
-    print("tp_size = ", tp_size, file=sys.stderr)
-    print("pp_size = ", pp_size, file=sys.stderr)
-    print("dp size = ", dp_size, file=sys.stderr)
-    print("mp_size = ", mp_size, file=sys.stderr)
-    print(" ", file=sys.stderr)
+dp_size = topo.dp_size
+mp_size = topo.size("model")
 
 mynode = world_rank // local_size
 
-num_tp_groups = world_size // tp_size
-num_pp_groups = world_size // pp_size
-num_dp_groups = world_size // dp_size
-num_mp_groups = dp_size
-
-if world_rank == 0:
-    print("number of data     parallel groups = ", num_dp_groups, file=sys.stderr)
-    print("number of pipeline parallel groups = ", num_pp_groups, file=sys.stderr)
-    print("number of tensor   parallel groups = ", num_tp_groups, file=sys.stderr)
-    print("number of model    parallel groups = ", num_mp_groups, file=sys.stderr)
-    print(" ", file=sys.stderr)
-
-# the tp_group_ranks are always sequential
-tp_group_ranks = []
-for g in range(num_tp_groups):
-    ranks = range(g*tp_size, (g + 1)*tp_size)
-    tp_group_ranks.append(list(ranks))
-
-if world_rank == 0:
-    print("tp_group_ranks:", file=sys.stderr)
-    for g in range(num_tp_groups):
-        print(tp_group_ranks[g], file=sys.stderr)
-    print(" ", file=sys.stderr)
-
-dp_group_ranks = []
-for p in range(pp_size):
-    for t in range(tp_size):
-        ranks = []
-        for d in range(dp_size):
-            if order == "tdp":
-                myrank = t + d*tp_size + p*tp_size*dp_size
-            else:
-                myrank = t + p*tp_size + d*tp_size*pp_size
-            ranks.append(myrank)
-        dp_group_ranks.append(list(ranks))
-        group = torch.distributed.new_group(ranks)
-        if world_rank in ranks:
-            _DATA_PARALLEL_GROUP = group
-
-if world_rank == 0:
-    print("dp_group_ranks:", file=sys.stderr)
-    for g in range(num_dp_groups):
-        print(dp_group_ranks[g], file=sys.stderr)
-    print(" ", file=sys.stderr)
-
-pp_group_ranks = []
-for d in range(dp_size):
-    for t in range(tp_size):
-        ranks = []
-        for p in range(pp_size):
-            if order == "tdp":
-                myrank = t + d*tp_size + p*tp_size*dp_size
-            else:
-                myrank = t + p*tp_size + d*tp_size*pp_size
-            ranks.append(myrank)
-        pp_group_ranks.append(list(ranks))
-        group = torch.distributed.new_group(ranks)
-        if world_rank in ranks:
-            _PIPELINE_MODEL_PARALLEL_GROUP = group
-
 if world_rank == 0:
-    print("pp_group_ranks:", file=sys.stderr)
-    for g in range(num_pp_groups):
-        print(pp_group_ranks[g], file=sys.stderr)
-    print(" ", file=sys.stderr)
+    topo.describe(["tensor", "context", "expert", "data", "pipeline", "model"], args.print_groups, file=sys.stderr)
 
-mp_group_ranks = []
-for d in range(dp_size):
-    ranks = []
-    for p in range(pp_size):
-        for t in range(tp_size):
-            if order == "tdp":
-                myrank = t + d*tp_size + p*tp_size*dp_size
-            else:
-                myrank = t + p*tp_size + d*tp_size*pp_size
-            ranks.append(myrank)
-    mp_group_ranks.append(list(ranks))
-    group = torch.distributed.new_group(ranks)
-    if world_rank in ranks:
-        _MODEL_PARALLEL_GROUP = group
-            
-if world_rank == 0:
-    print("mp_group_ranks:", file=sys.stderr)
-    for g in range(num_mp_groups):
-        print(mp_group_ranks[g], file=sys.stderr)
-    print(" ", file=sys.stderr)
+# only the groups for the selected communicator are created, and only when first needed
+groups = pgroups.ProcessGroups(comm, topo, args.group_init)
 
-if communicator == "data":
-    mygroup = _DATA_PARALLEL_GROUP
-    group_size = dp_size
-elif communicator == "pipeline":
-    mygroup = _PIPELINE_MODEL_PARALLEL_GROUP
-    group_size = pp_size
-elif communicator == "model":
-    mygroup = _MODEL_PARALLEL_GROUP
-    group_size = mp_size
+mygroup, myranks = groups.get(communicator)
+group_size = topo.size(communicator)
+ops = reduceops.ops(args, comm, dtypes, group_size)
+group_ranks = topo.groups(communicator)
 
 if world_rank == 0:
     print("using communicator = ", communicator, "; order =", order, "; group size = ", group_size, file=sys.stderr)
@@ -156,28 +78,32 @@ if world_rank == 0:
 
 group_rank = dist.get_rank(group=mygroup)
 
-if  group_rank == 0:
-    if order == 'tdp':
-        filename = "world_rank." + str(world_rank) + ".tdp.txt"
-    else:
-        filename = "world_rank." + str(world_rank) + ".tpd.txt"
-    outfile = open(filename, 'w')
+# the per-group times are gathered to rank 0 after the sweep and written to one table per dtype and op
+group_times = {(dtype_name, op_name): grouptimes.GroupTimes(sweep) for (dtype_name, dtype, esize), (op_name, op) in itertools.product(dtypes, ops)}
 
 ###############################################################################################
 
-nMB = 10000.0
-npts = int(nMB*1.0e6/4.0)
+# every size takes views of one preallocated pool, sized to the largest message
+pool = buffers.BufferPool(comm, args.fill)
+for nMB in sweep:
+    for dtype_name, dtype, esize in dtypes:
+        nlocal = int((int(nMB*1.0e6/esize) + 1)/group_size)
+        pool.request("input", esize*nlocal*group_size)
+        pool.request("output", esize*nlocal)
+pool.allocate()
 
-Tensor = torch.rand(npts, device='cuda')
+if world_rank == 0:
+    print(pool.report(), file=sys.stderr)
+    print(" ", file=sys.stderr)
 
 group_is_in_node = 0
 if group_rank == 0:
     if mynode == 0:
         group_is_in_node = 1
 
-NodeTensor  = torch.tensor([[group_is_in_node]], dtype=torch.int, device='cuda')
+NodeTensor  = torch.tensor([[group_is_in_node]], dtype=torch.int, device=device)
 dist.all_reduce(NodeTensor, op=dist.ReduceOp.SUM, group=None)
-torch.cuda.synchronize()
+comm.synchronize()
 
 NodeTensor = NodeTensor.cpu()
 
@@ -188,84 +114,90 @@ if world_rank == 0:
     print(" ", file=sys.stderr)
 
 
+writer = results.open_writer(args, comm, tp_size=tp_size, pp_size=pp_size, cp_size=cp_size, ep_size=ep_size, dp_size=dp_size, order=order,
+                             communicator=communicator, groups_per_node=groups_per_node)
+
+# the first collective on a group sets up its communicator, so time it apart from the sweep
+groups.first_call(communicator)
+groups.report(file=sys.stderr)
+
 if world_rank == 0:
-    print(" size(MB)   tavg(usec)    tmin(usec)    tmax(usec)  avgbw(GB/sec)  maxbw(GB/sec)  minbw(GB/sec)", file=sys.stderr)
+    if latency:
+        print(" size(KB)    p50(usec)    p99(usec)   tavg(usec)   tmin(usec)   tmax(usec)  avgbw(GB/sec)   timer  dtype          op", file=sys.stderr)
+    else:
+        print(" size(MB)   tavg(usec)    tmin(usec)    tmax(usec)  avgbw(GB/sec)  maxbw(GB/sec)  minbw(GB/sec)   timer  dtype          op", file=sys.stderr)
 
-for nMB in [0.10,0.12,0.15,0.20,0.32,0.40,0.50,0.64,0.80,1.00,1.25,1.50,2.00,3.16,4.00,5.00,6.40,8.00,\
-            10.0,12.5,15.0,20.0,31.6,40.0,50.0,64.0,80.0,100.0,125.0,160.0,200.0,250.0,316.0,400.0,500.0,640.0,800.0,\
-            1000.0,1250.0,1600.0,2000.0,2500.0,3160.0,4000.0,5000.0,6400.0,8000.0]:
+for k, nMB in enumerate(sweep):
 
     dist.barrier(group=None)
 
-    if nMB < 10.0:
-        maxiter = 100*multiplier
-    elif nMB < 512.0:
-        maxiter = 20*multiplier
-    elif nMB < 2000.0:
-        maxiter = 10*multiplier
-    else:
-        maxiter = 5*multiplier
+    # sizes are in bytes, so the element count depends on the dtype ; every reduction op is run for every dtype
+    for (dtype_name, dtype, esize), (op_name, op) in itertools.product(dtypes, ops):
 
-    nglobal = int(nMB*1.0e6/4.0)
-    nlocal  = int((nglobal + 1)/group_size)
-    nglobal = nlocal*group_size
+        nglobal = int(nMB*1.0e6/esize)
+        nlocal  = int((nglobal + 1)/group_size)
+        nglobal = nlocal*group_size
 
-    Input  = torch.rand(nglobal, device='cuda')
-    Output = torch.rand(nlocal,  device='cuda')
-    torch.cuda.synchronize()
+        Input  = pool.view("input",  nglobal, dtype)
+        Output = pool.view("output", nlocal, dtype)
 
-    # launch two calls outside the timing loop
-    dist.reduce_scatter_tensor(Output, Input, group=mygroup)
-    torch.cuda.synchronize()
-    dist.reduce_scatter_tensor(Output, Input, group=mygroup)
-    torch.cuda.synchronize()
+        def collective(async_op):
+            return dist.reduce_scatter_tensor(Output, Input, group=mygroup, op=op, async_op=async_op)
 
-    tbeg = time.perf_counter()
-    t1 = tbeg
-    tmin = 1.0e30
-    tmax = 0.0
-    tsum = 0.0
+        def barrier():
+            dist.barrier(group=None)
 
-    for i in range(maxiter):
-        dist.reduce_scatter_tensor(Output, Input, group=mygroup)
-        torch.cuda.synchronize()
-        tsum = tsum + (time.perf_counter() - t1)
-        dist.barrier(group=None)
-        t2 = time.perf_counter()
-        if (t2 - t1) < tmin:
-            tmin = (t2 - t1)
-        if (t2 - t1) > tmax:
-            tmax = (t2 - t1)
-        t1 = t2
+        # two warmup calls are made outside the timing loop
+        times = sampler.run(timer, collective, nMB, barrier=barrier)
 
-    torch.cuda.synchronize()
-    tend = time.perf_counter()
+        group_times[(dtype_name, op_name)].record(k, times["group"])
 
-    elapsed = tend - tbeg
-    tavg = elapsed / maxiter
+        # the device timer brackets only the collective for this rank's group, so take the slowest group
+        if "device" in times:
+            times["device"] = timing.slowest(times["device"], comm)
 
-    tsum = tsum / maxiter
+        factor = groups_per_node
 
-    del Output
-    del Input
-    torch.cuda.synchronize()
+        nbytes = factor*esize*1.0e-9*nglobal*((group_size - 1)/group_size)
 
-    factor = groups_per_node
+        for name in timer.timers():
+            tavg, tmin, tmax = timing.summarize(times[name])
 
-    avgbw = factor*4.0e-9*nglobal*((group_size - 1)/group_size)/tavg
-    maxbw = factor*4.0e-9*nglobal*((group_size - 1)/group_size)/tmin
-    minbw = factor*4.0e-9*nglobal*((group_size - 1)/group_size)/tmax
+            avgbw = nbytes/tavg
+            maxbw = nbytes/tmin
+            minbw = nbytes/tmax
 
+            if world_rank == 0 and latency:
+                p50, p99 = timing.percentiles(times[name])
+                print("{:9.1f}".format(1.0e3*nMB), "  ", "{:9.1f}".format(p50*1.0e6), "  ", "{:9.1f}".format(p99*1.0e6), "  ", "{:9.1f}".format(tavg*1.0e6), \
+                      "  ", "{:9.1f}".format(tmin*1.0e6), "  ", "{:9.1f}".format(tmax*1.0e6), "     ", "{:7.2f}".format(avgbw), "  ", "{:>6s}".format(name), "{:>6s}".format(dtype_name), "{:>11s}".format(op_name), file=sys.stderr)
+            elif world_rank == 0:
+                print("{:8.2f}".format(nMB), "  ", "{:7.1f}".format(tavg*1.0e6), "      ", "{:7.1f}".format(tmin*1.0e6), "      ", "{:7.1f}".format(tmax*1.0e6), \
+                      "     ", "{:7.2f}".format(avgbw), "      ", "{:7.2f}".format(maxbw), "      ", "{:7.2f}".format(minbw), "  ", "{:>6s}".format(name), "{:>6s}".format(dtype_name), "{:>11s}".format(op_name), file=sys.stderr)
 
-    if world_rank == 0:
-        print("{:8.2f}".format(nMB), "  ", "{:7.1f}".format(tavg*1.0e6), "      ", "{:7.1f}".format(tmin*1.0e6), "      ", "{:7.1f}".format(tmax*1.0e6), \
-              "     ", "{:7.2f}".format(avgbw), "      ", "{:7.2f}".format(maxbw), "      ", "{:7.2f}".format(minbw), file=sys.stderr)
+            record = {"collective": "reduce_scatter", "size_MB": nMB, "bytes": esize*nglobal, "group": communicator, "group_size": group_size, "timer": name, "dtype": dtype_name, "op": op_name}
+            record.update(results.timing_record(times[name], nbytes))
+            writer.write(record)
 
-    if group_rank == 0:
-        print("world_rank ", world_rank, " reports avg time = ", "{:8.3f}".format(tsum), " msec for array size ", "{:6.1f}".format(nMB), file=outfile)
-        outfile.flush()
+# one gather of the group times, and one consolidated table on rank 0 that ranks the groups
+# by their slowdown relative to the median group, for every dtype and op
+for (dtype_name, dtype, esize), (op_name, op) in itertools.product(dtypes, ops):
+    gathered = group_times[(dtype_name, op_name)].gather(comm)
 
-if group_rank == 0:
-    outfile.close()
-
-dist.destroy_process_group()
+    if world_rank == 0:
+        table = grouptimes.slowdown_table(gathered, group_ranks)
+        filename = "group_times." + communicator + "." + order + ("." + dtype_name if len(dtypes) > 1 else "") + \
+                   ("." + op_name if len(ops) > 1 else "") + ".txt"
+        grouptimes.write_table(filename, table, sweep, "# megatron-reduce-scatter.py : communicator = " + communicator + " ; order = " + order + " ; dtype = " + dtype_name + " ; op = " + op_name)
+        print("wrote the times for ", len(table), " groups to ", filename, file=sys.stderr)
+
+        for row in table:
+            for k, nMB in enumerate(sweep):
+                record = {"collective": "reduce_scatter", "size_MB": nMB, "group": communicator, "group_size": group_size, "timer": "group", "dtype": dtype_name, "op": op_name,
+                          "group_index": row["group"], "leader": row["leader"], "tavg_usec": 1.0e6*row["tavg"][k],
+                          "tmin_usec": 1.0e6*row["tmin"][k], "tmax_usec": 1.0e6*row["tmax"][k], "mean_slowdown": row["mean_slowdown"]}
+                writer.write(record)
+
+writer.close()
+
+comm.destroy()
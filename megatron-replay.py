@@ -0,0 +1,200 @@
+#
+# Copyright IBM Corp. 2024
+# SPDX-License-Identifier: MIT
+#
+
+import sys
+import time
+import numpy as np
+import torch
+import torch.distributed as dist
+import argparse
+from commbench import backend, buffers, pgroups, results, topology, trace
+
+# usage : python megatron-replay.py trace.jsonl -t 4 -p 8
+#   replays a trace of collective calls on the groups of the same rank grid as the megatron codes ;
+#   python megatron-replay.py profile.json --convert trace.jsonl converts a torch profiler trace
+parser = argparse.ArgumentParser()
+parser.add_argument("trace")
+parser.add_argument("-r", "--repeat", type=int, default=5)
+parser.add_argument("--no-gaps", action="store_true")
+parser.add_argument("--convert", type=str, default=None)
+parser.add_argument("-n", "--top", type=int, default=20)
+topology.add_topology_args(parser)
+pgroups.add_group_args(parser)
+backend.add_backend_args(parser)
+buffers.add_buffer_args(parser)
+results.add_results_args(parser)
+
+args = parser.parse_args()
+
+calls = trace.load(args.trace)
+
+if args.convert is not None:
+    trace.write_jsonl(args.convert, calls)
+    print("wrote ", len(calls), " calls to ", args.convert, file=sys.stderr)
+    sys.exit(0)
+
+comm = backend.init(args)
+
+world_rank = comm.rank
+world_size = comm.world_size
+device = comm.device
+use_events = comm.device_type == "cuda"
+
+if world_rank == 0:
+    print("backend : ", comm.name, " device : ", comm.device_type, " version : ", comm.version(), file=sys.stderr)
+
+topo = topology.Topology(world_size, args.tensor_parallel, args.pipeline_parallel, args.context_parallel, args.expert_parallel, args.order)
+
+kinds = [kind for kind in topology.KINDS]
+trace.resolve_groups(calls, topo, kinds)
+
+# every rank creates the groups in the trace in the same order, before the replay
+groups = pgroups.ProcessGroups(comm, topo, args.group_init)
+used = sorted(set(call["group"] for call in calls if call["group"] != "world"))
+mygroups = {"world": (None, list(range(world_size)))}
+for kind in used:
+    mygroups[kind] = groups.get(kind)
+
+# one input and one output region, each sized for the largest call
+pool = buffers.BufferPool(comm, args.fill)
+for call in calls:
+    esize = torch.empty(0, dtype=buffers.DTYPES[call["dtype"]]).element_size()
+    nin, nout = trace.buffer_counts(call, len(mygroups[call["group"]][1]))
+    pool.request("input", esize*nin)
+    pool.request("output", esize*nout)
+pool.allocate()
+
+if world_rank == 0:
+    print(pool.report(), file=sys.stderr)
+    print("trace : ", len(calls), " calls on groups ", ["world"] + used, file=sys.stderr)
+    print(" ", file=sys.stderr)
+
+writer = results.open_writer(args, comm, trace=args.trace, tp_size=args.tensor_parallel, pp_size=args.pipeline_parallel,
+                             cp_size=args.context_parallel, ep_size=args.expert_parallel, dp_size=topo.dp_size, order=args.order)
+
+# a launcher for every call, with its views bound once, so that the replay loop does no setup
+def launcher(call):
+    group, ranks = mygroups[call["group"]]
+    dtype = buffers.DTYPES[call["dtype"]]
+    nin, nout = trace.buffer_counts(call, len(ranks))
+    inp = pool.view("input", nin, dtype)
+    out = pool.view("output", nout, dtype)
+    op = call["op"]
+    if op == "allreduce":
+        return lambda: dist.all_reduce(inp, group=group)
+    if op == "allgather":
+        return lambda: dist.all_gather_into_tensor(out, inp, group=group)
+    if op == "reduce_scatter":
+        return lambda: dist.reduce_scatter_tensor(out, inp, group=group)
+    if op == "alltoall":
+        return lambda: dist.all_to_all_single(out, inp, group=group)
+    if op == "broadcast":
+        return lambda: dist.broadcast(inp, int(ranks[0]), group=group)
+    return lambda: dist.barrier(group=group)
+
+launches = [launcher(call) for call in calls]
+gaps = np.array([0.0 if args.no_gaps else 1.0e-6*call.get("gap_us", 0.0) for call in calls])
+
+# the host waits out each recorded gap before the next launch, spinning for short gaps
+def pause(seconds):
+    if seconds <= 0.0:
+        return
+    tend = time.perf_counter() + seconds
+    if seconds > 2.0e-3:
+        time.sleep(seconds - 1.0e-3)
+    while time.perf_counter() < tend:
+        pass
+
+def replay():
+    times = np.empty(len(calls), dtype=np.float64)
+    if use_events:
+        starts = [torch.cuda.Event(enable_timing=True) for call in calls]
+        stops = [torch.cuda.Event(enable_timing=True) for call in calls]
+    t0 = time.perf_counter()
+    for i in range(len(calls)):
+        pause(gaps[i])
+        if use_events:
+            starts[i].record()
+            launches[i]()
+            stops[i].record()
+        else:
+            t1 = time.perf_counter()
+            launches[i]()
+            times[i] = time.perf_counter() - t1
+    comm.synchronize()
+    total = time.perf_counter() - t0
+    if use_events:
+        for i in range(len(calls)):
+            times[i] = 1.0e-3*starts[i].elapsed_time(stops[i])
+    return total, times
+
+# one pass to set up the communicators, then the timed passes
+replay()
+
+totals = np.empty(args.repeat, dtype=np.float64)
+per_call = np.empty((args.repeat, len(calls)), dtype=np.float64)
+for r in range(args.repeat):
+    dist.barrier()
+    totals[r], per_call[r] = replay()
+
+# the slowest rank for every call and for the whole trace
+per_call = torch.from_numpy(per_call).to(device)
+dist.all_reduce(per_call, op=dist.ReduceOp.MAX)
+per_call = per_call.cpu().numpy()
+totals = torch.from_numpy(totals).to(device)
+dist.all_reduce(totals, op=dist.ReduceOp.MAX)
+totals = totals.cpu().numpy()
+
+recorded = np.array([1.0e-6*call["time_us"] if "time_us" in call else np.nan for call in calls])
+have_recorded = not np.isnan(recorded).any()
+recorded_total = float(gaps.sum() + recorded.sum()) if have_recorded else float("nan")
+
+if world_rank == 0:
+    print("replay of ", len(calls), " calls : total ", "{:.3f}".format(1.0e3*totals.mean()), " msec (min ", "{:.3f}".format(1.0e3*totals.min()),
+          ", max ", "{:.3f}".format(1.0e3*totals.max()), ") ; recorded ", "{:.3f}".format(1.0e3*recorded_total), " msec ; gaps ",
+          "{:.3f}".format(1.0e3*gaps.sum()), " msec", file=sys.stderr)
+    print(" ", file=sys.stderr)
+
+# calls with the same op, size, dtype, and group are reported together, largest total time first
+signatures = {}
+for i, call in enumerate(calls):
+    key = (call["op"], int(call.get("count", 0)), call["dtype"], call["group"])
+    signatures.setdefault(key, []).append(i)
+
+rows = []
+for key, index in signatures.items():
+    mean = float(per_call[:, index].mean())
+    rows.append((key, len(index), mean, float(np.nanmean(recorded[index])) if have_recorded else float("nan"), index))
+rows.sort(key=lambda row: row[1]*row[2], reverse=True)
+
+if world_rank == 0:
+    print(" op              count  dtype  group        calls   replay(usec)  recorded(usec)   ratio   share(%)", file=sys.stderr)
+    for (op, count, dtype_name, group), ncalls, mean, rec, index in rows[0:args.top]:
+        share = 100.0*ncalls*mean/per_call.mean(axis=0).sum()
+        print(" ", "{:14s}".format(op), "{:9d}".format(count), "{:>5s}".format(dtype_name), "  ", "{:11s}".format(group), "{:6d}".format(ncalls),
+              "{:14.1f}".format(1.0e6*mean), "{:15.1f}".format(1.0e6*rec), "{:8.3f}".format(mean/rec), "{:10.1f}".format(share), file=sys.stderr)
+
+for (op, count, dtype_name, group), ncalls, mean, rec, index in rows:
+    esize = torch.empty(0, dtype=buffers.DTYPES[dtype_name]).element_size()
+    record = {"collective": op, "size_MB": 1.0e-6*esize*count, "bytes": esize*count, "dtype": dtype_name, "group": group,
+              "group_size": len(mygroups[group][1]), "timer": "replay", "calls": ncalls}
+    record.update(results.timing_record(per_call[:, index].reshape(-1), 0.0))
+    for key in ("avgbw_GBs", "maxbw_GBs", "minbw_GBs"):
+        del record[key]
+    if have_recorded:
+        record["recorded_usec"] = 1.0e6*rec
+        record["replay_ratio"] = mean/rec
+    writer.write(record)
+
+record = {"collective": "trace", "timer": "replay", "calls": len(calls), "iterations": args.repeat,
+          "tavg_usec": 1.0e6*float(totals.mean()), "tmin_usec": 1.0e6*float(totals.min()), "tmax_usec": 1.0e6*float(totals.max())}
+if have_recorded:
+    record["recorded_usec"] = 1.0e6*recorded_total
+    record["replay_ratio"] = float(totals.mean())/recorded_total
+writer.write(record)
+
+writer.close()
+
+comm.destroy()
@@ -0,0 +1,174 @@
+#
+# Copyright IBM Corp. 2024
+# SPDX-License-Identifier: MIT
+#
+
+import sys
+import time
+import numpy as np
+import torch
+import torch.distributed as dist
+import argparse
+from commbench import backend, buffers, results, sampling, sizes, timing
+
+# usage : python overlap-loop.py -c allreduce --matmul 8192 --matmul-count 4
+#   times the collective alone, the matmuls alone, and both at the same time for every size
+parser = argparse.ArgumentParser()
+parser.add_argument("-c", "--collective", choices=["allreduce", "allgather", "reduce_scatter"], default="allreduce")
+parser.add_argument("--matmul", type=int, default=4096)
+parser.add_argument("--matmul-count", type=int, default=1)
+parser.add_argument("-m", "--multiplier", type=int, default=1)
+backend.add_backend_args(parser)
+sampling.add_sampling_args(parser)
+sizes.add_size_args(parser)
+buffers.add_buffer_args(parser)
+buffers.add_dtype_args(parser)
+results.add_results_args(parser)
+
+args = parser.parse_args()
+collective_name = args.collective
+nmat = args.matmul
+count = args.matmul_count
+
+comm = backend.init(args)
+
+rank = comm.rank
+world_size = comm.world_size
+device = comm.device
+use_events = comm.device_type == "cuda"
+
+# the overlap has to be seen from the host, so every case uses the host timer : launch, then
+# synchronize, so that the time covers both the collective and the compute
+timer = timing.Timer(comm, "host")
+sampler = sampling.Sampler(comm, args)
+sweep = sizes.sweep(args)
+dtypes = buffers.dtypes(args)
+
+if rank == 0:
+    print("backend : ", comm.name, " device : ", comm.device_type, " version : ", comm.version(), file=sys.stderr)
+
+torch.manual_seed(1235911);
+
+A = buffers.allocate(nmat*nmat, device, "random").view(nmat, nmat)
+B = buffers.allocate(nmat*nmat, device, "random").view(nmat, nmat)
+C = buffers.allocate(nmat*nmat, device, "none").view(nmat, nmat)
+
+pool = buffers.BufferPool(comm, args.fill)
+for nMB in sweep:
+    for dtype_name, dtype, esize in dtypes:
+        nglobal = int(nMB*1.0e6/esize)
+        nlocal = int((nglobal + 1)/world_size)
+        pool.request("input", esize*max(nglobal, nlocal*world_size))
+        pool.request("output", esize*nlocal*world_size)
+pool.allocate()
+
+if rank == 0:
+    print(pool.report(), file=sys.stderr)
+    print("compute : ", count, " matmul(s) of ", nmat, " x ", nmat, " float32", file=sys.stderr)
+    print(" ", file=sys.stderr)
+
+writer = results.open_writer(args, comm, matmul=nmat, matmul_count=count)
+
+# the matmuls, with their own duration recorded on every call so that the compute time while
+# the collective is running can be compared with the compute time alone
+marks = []
+
+def compute():
+    if use_events:
+        start = torch.cuda.Event(enable_timing=True)
+        stop = torch.cuda.Event(enable_timing=True)
+        start.record()
+        for r in range(count):
+            torch.mm(A, B, out=C)
+        stop.record()
+        marks.append((start, stop))
+    else:
+        t1 = time.perf_counter()
+        for r in range(count):
+            torch.mm(A, B, out=C)
+        marks.append(time.perf_counter() - t1)
+
+def compute_times(n):
+    recent = marks[-n:]
+    if use_events:
+        comm.synchronize()
+        return np.array([1.0e-3*start.elapsed_time(stop) for start, stop in recent])
+    return np.array(recent)
+
+if rank == 0:
+    print(" size(MB)   comm(usec)  compute(usec)  overlap(usec)  efficiency  compute_slowdown  commbw(GB/sec)  dtype", file=sys.stderr)
+
+for nMB in sweep:
+
+    # sizes are in bytes, so the element count depends on the dtype ; the matmuls stay in float32
+    for dtype_name, dtype, esize in dtypes:
+
+        nglobal = int(nMB*1.0e6/esize)
+        nlocal  = int((nglobal + 1)/world_size)
+
+        if collective_name == "allreduce":
+            Buffer = pool.view("input", nglobal, dtype)
+            nbytes = esize*2.0e-9*nglobal*((world_size - 1)/world_size)
+            def launch(async_op):
+                return dist.all_reduce(Buffer, async_op=async_op)
+        elif collective_name == "allgather":
+            nglobal = nlocal*world_size
+            Input  = pool.view("input", nlocal, dtype)
+            Output = pool.view("output", nglobal, dtype)
+            nbytes = esize*1.0e-9*nglobal*((world_size - 1)/world_size)
+            def launch(async_op):
+                return dist.all_gather_into_tensor(Output, Input, async_op=async_op)
+        else:
+            nglobal = nlocal*world_size
+            Input  = pool.view("input", nglobal, dtype)
+            Output = pool.view("output", nlocal, dtype)
+            nbytes = esize*1.0e-9*nglobal*((world_size - 1)/world_size)
+            def launch(async_op):
+                return dist.reduce_scatter_tensor(Output, Input, async_op=async_op)
+
+        def compute_only(async_op):
+            compute()
+
+        # the collective goes to the communication stream (or the backend's threads on the CPU)
+        # while the matmuls run on the default stream ; the host waits for both
+        def overlapped(async_op):
+            work = launch(True)
+            compute()
+            work.wait()
+
+        times = {}
+        times["comm"] = sampler.run(timer, launch, nMB)["host"]
+        times["compute"] = sampler.run(timer, compute_only, nMB)["host"]
+        compute_alone = compute_times(len(times["compute"]))
+        times["overlap"] = sampler.run(timer, overlapped, nMB)["host"]
+        compute_during = compute_times(len(times["overlap"]))
+        marks.clear()
+
+        # 1 means the collective and the compute ran one after the other, and 2 means that the
+        # shorter of the two was completely hidden when they take the same time
+        t_comm = float(np.mean(times["comm"]))
+        t_compute = float(np.mean(times["compute"]))
+        t_overlap = float(np.mean(times["overlap"]))
+        efficiency = (t_compute + t_comm)/t_overlap
+        compute_slowdown = float(np.mean(compute_during))/float(np.mean(compute_alone))
+
+        if rank == 0:
+            print("{:8.2f}".format(nMB), "  ", "{:9.1f}".format(1.0e6*t_comm), "    ", "{:9.1f}".format(1.0e6*t_compute), "    ", "{:9.1f}".format(1.0e6*t_overlap),
+                  "    ", "{:8.3f}".format(efficiency), "    ", "{:12.3f}".format(compute_slowdown), "     ", "{:9.2f}".format(nbytes/t_comm), "  ", "{:>5s}".format(dtype_name), file=sys.stderr)
+
+        for name in times:
+            record = {"collective": collective_name, "size_MB": nMB, "bytes": esize*nglobal, "group": "world", "group_size": world_size, "timer": name,
+                      "dtype": dtype_name}
+            record.update(results.timing_record(times[name], nbytes))
+            if name == "compute":
+                record["bytes"] = 0
+                for key in ("avgbw_GBs", "maxbw_GBs", "minbw_GBs"):
+                    del record[key]
+            if name == "overlap":
+                record["overlap_efficiency"] = efficiency
+                record["compute_slowdown"] = compute_slowdown
+            writer.write(record)
+
+writer.close()
+
+comm.destroy()
@@ -3,93 +3,107 @@
 # SPDX-License-Identifier: MIT
 #
 
-import os
 import sys
+import itertools
 import torch
 import torch.distributed as dist
-import time
 import argparse
+from commbench import backend, buffers, reduceops, results, sampling, sizes, timing
 
 parser = argparse.ArgumentParser()
 parser.add_argument("-m", "--multiplier", type=int, default=1)
+parser.add_argument("--inflight", type=int, default=1)
+backend.add_backend_args(parser)
+timing.add_timing_args(parser)
+sampling.add_sampling_args(parser)
+sizes.add_size_args(parser)
+buffers.add_buffer_args(parser)
+buffers.add_dtype_args(parser)
+reduceops.add_op_args(parser)
+results.add_results_args(parser)
 
 args = parser.parse_args()
-multiplier = args.multiplier
+inflight = args.inflight
 
-local_rank = int(os.environ["LOCAL_RANK"])
-rank = int(os.environ["RANK"])
-world_size = int(os.environ["WORLD_SIZE"])
+comm = backend.init(args)
 
-torch.cuda.set_device(local_rank)
+rank = comm.rank
+world_size = comm.world_size
+device = comm.device
 
-dist.init_process_group("nccl")
+timer = timing.Timer(comm, args.timer)
+sampler = sampling.Sampler(comm, args)
+sweep = sizes.sweep(args)
+dtypes = buffers.dtypes(args)
 
 if rank == 0:
-    print("NCCL version : ", torch.cuda.nccl.version(), file=sys.stderr)
+    print("backend : ", comm.name, " device : ", comm.device_type, " version : ", comm.version(), file=sys.stderr)
+
+ops = reduceops.ops(args, comm, dtypes, world_size)
 
 torch.manual_seed(1235911);
 
+# every size, dtype, and in-flight slot takes views of one preallocated pool, sized to the largest message
+pool = buffers.BufferPool(comm, args.fill)
+for nMB in sweep:
+    for dtype_name, dtype, esize in dtypes:
+        nlocal = int((int(nMB*1.0e6/esize) + 1)/world_size)
+        for slot in range(inflight):
+            pool.request(("input", slot), esize*nlocal*world_size)
+            pool.request(("output", slot), esize*nlocal)
+pool.allocate()
+
+if rank == 0:
+    print(pool.report(), file=sys.stderr)
+
+writer = results.open_writer(args, comm)
+
 if rank == 0:
-    print(" size(MB)   tavg(usec)    tmin(usec)    tmax(usec)  avgbw(GB/sec)  maxbw(GB/sec)  minbw(GB/sec)", file=sys.stderr)
-
-for nMB in [0.10,0.12,0.15,0.20,0.32,0.40,0.50,0.64,0.80,1.00,1.25,1.50,2.00,3.16,4.00,5.00,6.40,8.00,\
-            10.0,12.5,15.0,20.0,31.6,40.0,50.0,64.0,80.0,100.0,125.0,160.0,200.0,250.0,316.0,400.0,500.0,640.0,800.0,\
-            1000.0,1250.0,1600.0,2000.0,2500.0,3160.0,4000.0,5000.0,6400.0,8000.0]:
-
-    if nMB < 10.0:
-        maxiter = 100*multiplier
-    elif nMB < 512.0:
-        maxiter = 20*multiplier
-    elif nMB < 2000.0:
-        maxiter = 10*multiplier
-    else:
-        maxiter = 5*multiplier
-
-    nglobal = int(nMB*1.0e6/4.0)
-    nlocal  = int((nglobal + 1)/world_size)
-    nglobal = nlocal*world_size
-
-    Input  = torch.rand(nglobal, device='cuda')
-    Output = torch.rand(nlocal,  device='cuda')
-    torch.cuda.synchronize()
-
-    # launch two calls outside the timing loop
-    dist.reduce_scatter_tensor(Output, Input)
-    torch.cuda.synchronize()
-    dist.reduce_scatter_tensor(Output, Input)
-    torch.cuda.synchronize()
-
-    tbeg = time.perf_counter()
-    t1 = tbeg
-    tmin = 1.0e30
-    tmax = 0.0
-
-    for i in range(maxiter):
-        dist.reduce_scatter_tensor(Output, Input)
-        torch.cuda.synchronize()
-        t2 = time.perf_counter()
-        if (t2 - t1) < tmin:
-            tmin = (t2 - t1)
-        if (t2 - t1) > tmax:
-            tmax = (t2 - t1)
-        t1 = t2
-
-    torch.cuda.synchronize()
-    tend = time.perf_counter()
-
-    del Output
-    del Input
-    torch.cuda.synchronize()
-
-    elapsed = tend - tbeg
-    tavg = elapsed / maxiter
-
-    avgbw = 4.0e-9*nglobal*((world_size - 1)/world_size)/tavg
-    maxbw = 4.0e-9*nglobal*((world_size - 1)/world_size)/tmin
-    minbw = 4.0e-9*nglobal*((world_size - 1)/world_size)/tmax
-
-    if rank == 0:
-        print("{:8.2f}".format(nMB), "  ", "{:7.1f}".format(tavg*1.0e6), "      ", "{:7.1f}".format(tmin*1.0e6), "      ", "{:7.1f}".format(tmax*1.0e6), \
-              "     ", "{:7.2f}".format(avgbw), "      ", "{:7.2f}".format(maxbw), "      ", "{:7.2f}".format(minbw), file=sys.stderr)
-
-dist.destroy_process_group()
+    print(" size(MB)   tavg(usec)    tmin(usec)    tmax(usec)  avgbw(GB/sec)  maxbw(GB/sec)  minbw(GB/sec)   timer  dtype          op", file=sys.stderr)
+
+for nMB in sweep:
+
+    # sizes are in bytes, so the element count depends on the dtype ; every reduction op is run for every dtype
+    for (dtype_name, dtype, esize), (op_name, op) in itertools.product(dtypes, ops):
+
+        nglobal = int(nMB*1.0e6/esize)
+        nlocal  = int((nglobal + 1)/world_size)
+        nglobal = nlocal*world_size
+
+        Inputs  = [pool.view(("input", slot),  nglobal, dtype) for slot in range(inflight)]
+        Outputs = [pool.view(("output", slot), nlocal, dtype)  for slot in range(inflight)]
+
+        def collective(async_op):
+            return dist.reduce_scatter_tensor(Outputs[0], Inputs[0], op=op, async_op=async_op)
+
+        # two warmup calls are made outside the timing loop
+        times = sampler.run(timer, collective, nMB)
+        maxiter = len(times[timer.timers()[0]])
+
+        # sustained throughput with several collectives outstanding on separate buffers
+        if inflight > 1:
+            def pipelined(slot, async_op):
+                return dist.reduce_scatter_tensor(Outputs[slot], Inputs[slot], op=op, async_op=async_op)
+
+            times["pipe" + str(inflight)] = timer.run_inflight(pipelined, inflight, maxiter)
+
+        nbytes = esize*1.0e-9*nglobal*((world_size - 1)/world_size)
+
+        for name in times:
+            tavg, tmin, tmax = timing.summarize(times[name])
+
+            avgbw = nbytes/tavg
+            maxbw = nbytes/tmin
+            minbw = nbytes/tmax
+
+            if rank == 0:
+                print("{:8.2f}".format(nMB), "  ", "{:7.1f}".format(tavg*1.0e6), "      ", "{:7.1f}".format(tmin*1.0e6), "      ", "{:7.1f}".format(tmax*1.0e6), \
+                      "     ", "{:7.2f}".format(avgbw), "      ", "{:7.2f}".format(maxbw), "      ", "{:7.2f}".format(minbw), "  ", "{:>6s}".format(name), "{:>6s}".format(dtype_name), "{:>11s}".format(op_name), file=sys.stderr)
+
+            record = {"collective": "reduce_scatter", "size_MB": nMB, "bytes": esize*nglobal, "group": "world", "group_size": world_size, "timer": name, "dtype": dtype_name, "op": op_name}
+            record.update(results.timing_record(times[name], nbytes))
+            writer.write(record)
+
+writer.close()
+
+comm.destroy()
@@ -0,0 +1,30 @@
+#
+# Copyright IBM Corp. 2024
+# SPDX-License-Identifier: MIT
+#
+
+import pytest
+
+pytest.importorskip("torch")
+
+from commbench import results
+
+
+def test_record_columns_union():
+    rows = [{"collective": "fsdp_step", "timer": "compute", "world_size": 8},
+            {"collective": "fsdp_step", "timer": "step", "prefetch": 1, "exposed_usec": 12.5, "world_size": 8, "custom": "x"}]
+    assert results.record_columns(rows) == ["collective", "timer", "prefetch", "exposed_usec", "world_size", "custom"]
+
+
+def test_parquet_keeps_fields_missing_from_first_record(tmp_path):
+    pyarrow_parquet = pytest.importorskip("pyarrow.parquet")
+    path = str(tmp_path / "out.parquet")
+    writer = results.ResultsWriter(path, meta={"world_size": 8})
+    writer.write({"collective": "fsdp_step", "timer": "compute", "tavg_usec": 10.0})
+    writer.write({"collective": "fsdp_step", "timer": "step", "tavg_usec": 20.0, "prefetch": 2, "exposed_usec": 5.0})
+    writer.close()
+
+    table = pyarrow_parquet.read_table(path).to_pylist()
+    assert table[0]["prefetch"] is None and table[0]["exposed_usec"] is None
+    assert table[1]["prefetch"] == 2 and table[1]["exposed_usec"] == 5.0
+    assert all(row["world_size"] == 8 for row in table)
@@ -0,0 +1,40 @@
+#
+# Copyright IBM Corp. 2024
+# SPDX-License-Identifier: MIT
+#
+
+import pytest
+
+from commbench import trace
+
+
+def write(tmp_path, lines):
+    path = tmp_path / "trace.jsonl"
+    path.write_text("\n".join(lines) + "\n")
+    return str(path)
+
+
+def test_barrier_without_dtype(tmp_path):
+    path = write(tmp_path, ['{"op": "allreduce", "count": 1024, "dtype": "bf16", "group": "data"}',
+                            '{"op": "barrier", "group": "world", "gap_us": 10.0}'])
+    calls = trace.read_jsonl(path)
+    assert calls[1]["dtype"] == "fp32" and calls[1]["count"] == 0
+    assert trace.buffer_counts(calls[1], 8) == (0, 0)
+
+
+def test_unsupported_dtype(tmp_path):
+    path = write(tmp_path, ['{"op": "allreduce", "count": 1024, "dtype": "fp8", "group": "data"}'])
+    with pytest.raises(SystemExit, match="unsupported dtype fp8"):
+        trace.read_jsonl(path)
+
+
+def test_missing_dtype(tmp_path):
+    path = write(tmp_path, ['{"op": "allgather", "count": 1024, "group": "data"}'])
+    with pytest.raises(SystemExit, match="allgather call has no dtype"):
+        trace.read_jsonl(path)
+
+
+def test_unknown_op(tmp_path):
+    path = write(tmp_path, ['{"op": "scatter", "count": 1024, "dtype": "fp32"}'])
+    with pytest.raises(SystemExit, match="unknown op scatter"):
+        trace.read_jsonl(path)